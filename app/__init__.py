@@ -1,5 +1,6 @@
+import os
 from flask import Flask
-from config import Config
+from config import config_profiles
 from jinja2 import StrictUndefined
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -10,20 +11,25 @@ import sqlalchemy.orm as so
 
 app = Flask(__name__)
 app.jinja_env.undefined = StrictUndefined
-app.config.from_object(Config)
+app.config.from_object(config_profiles[os.environ.get('APP_PROFILE', 'development')])
 db = SQLAlchemy(app)
+
+from app.storage import apply_sqlite_pragmas
+with app.app_context():
+    apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
 login = LoginManager(app)
 login.login_view = 'login'
 
 csrf = CSRFProtect(app)
 app.jinja_env.globals["csrf_token"] = generate_csrf
 
-from app import views, models
-from app.debug_utils import reset_db
+from app import views, models, commands
+from app.debug_utils import reset_db, seed_large_db
 
 @app.shell_context_processor
 def make_shell_context():
-    return dict(db=db, sa=sa, so=so, reset_db=reset_db)
+    return dict(db=db, sa=sa, so=so, reset_db=reset_db, seed_large_db=seed_large_db)
 
 @app.template_filter('datetimeformat')
 def datetimeformat(value, fmt="%Y‑%m‑%d %H:%M"):
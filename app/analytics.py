@@ -0,0 +1,152 @@
+import itertools
+from dataclasses import dataclass
+from datetime import date, timedelta
+import numpy as np
+from app import db
+
+BUCKETS = ('day', 'week')
+EPOCH = date(1970, 1, 1)
+STARS = 6  # ratings 0-5, as allowed by ReviewForm
+
+# days since the Unix epoch, computed by SQLite so rows arrive as plain integers
+DAY_SQL = "CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+
+def day_number(d):
+    return (d - EPOCH).days
+
+
+def _week(days):
+    # 1970-01-01 was a Thursday; shifting by three days makes weeks start on Monday
+    return (days + 3) // 7
+
+
+@dataclass
+class Trends:
+    bucket: str
+    starts: list[date]          # first day of each bucket
+    features: list[str]
+    star_counts: np.ndarray     # (features, buckets, STARS) reviews per rating
+    message_counts: np.ndarray  # (buckets,) chatbot messages, user and bot
+    active_users: np.ndarray    # (buckets,) distinct users who sent a message or left a review
+
+    @property
+    def review_counts(self):
+        return self.star_counts.sum(axis=2)
+
+    @property
+    def average_stars(self):
+        """ (features, buckets) mean rating, NaN where a feature had no reviews in a bucket. """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.star_counts * np.arange(STARS)).sum(axis=2) / self.review_counts
+
+    def rows(self):
+        """ One dict per bucket, for templates. """
+        averages = self.average_stars
+        return [
+            {
+                'start': start,
+                'messages': int(self.message_counts[i]),
+                'active_users': int(self.active_users[i]),
+                'reviews': int(self.review_counts[:, i].sum()),
+                'averages': [None if np.isnan(a) else float(a) for a in averages[:, i]],
+            }
+            for i, start in enumerate(self.starts)
+        ]
+
+    def summary(self):
+        if not self.starts:
+            return "No activity in this period."
+        reviews = int(self.star_counts.sum())
+        text = (f"{self.starts[0]:%d %b %Y} onwards: {int(self.message_counts.sum())} chatbot messages, "
+                f"up to {int(self.active_users.max())} active users per {self.bucket}")
+        if reviews:
+            average = (self.star_counts.sum(axis=(0, 1)) * np.arange(STARS)).sum() / reviews
+            text += f", {reviews} reviews averaging {average:.1f}/5"
+        return text + "."
+
+
+def aggregate_trends(start, end, bucket, review_days, review_features, review_stars, review_users,
+                     message_days, message_users, review_weights=None, message_weights=None):
+    """
+    Bucket raw columns into Trends with vectorised NumPy operations. Days are day numbers (see
+    day_number), users are ids with -1 for none, and review_features holds feature names.
+    Rows outside start..end (inclusive) are ignored. Pre-aggregated rows (app.trend_rollups) pass
+    how many reviews or messages each row stands for as weights; a weight of 0 marks a row that
+    only records an active user.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {BUCKETS}")
+    first, last = day_number(start), day_number(end)
+    if bucket == 'day':
+        n_buckets = last - first + 1
+        starts = [start + timedelta(days=i) for i in range(n_buckets)]
+        to_bucket = lambda days: days - first
+    else:
+        n_buckets = _week(last) - _week(first) + 1
+        monday = start - timedelta(days=start.weekday())
+        starts = [monday + timedelta(weeks=i) for i in range(n_buckets)]
+        to_bucket = lambda days: _week(days) - _week(first)
+    n_buckets = max(n_buckets, 0)
+    starts = starts[:n_buckets]
+
+    review_days = np.asarray(review_days, dtype=np.int64)
+    keep = (review_days >= first) & (review_days <= last)
+    features, feature_codes = np.unique(np.asarray(review_features, dtype=object)[keep].astype(str),
+                                        return_inverse=True)
+    review_buckets = to_bucket(review_days[keep])
+    stars = np.clip(np.asarray(review_stars, dtype=np.int64)[keep], 0, STARS - 1)
+    star_counts = np.bincount((feature_codes * n_buckets + review_buckets) * STARS + stars,
+                              weights=_kept(review_weights, keep), minlength=len(features) * n_buckets * STARS)
+    star_counts = star_counts.astype(np.int64).reshape(len(features), n_buckets, STARS)
+
+    message_days = np.asarray(message_days, dtype=np.int64)
+    message_keep = (message_days >= first) & (message_days <= last)
+    message_buckets = to_bucket(message_days[message_keep])
+    message_counts = np.bincount(message_buckets, weights=_kept(message_weights, message_keep),
+                                 minlength=n_buckets).astype(np.int64)
+
+    # distinct (bucket, user) pairs, then count pairs per bucket
+    buckets = np.concatenate([message_buckets, review_buckets])
+    users = np.concatenate([np.asarray(message_users, dtype=np.int64)[message_keep],
+                            np.asarray(review_users, dtype=np.int64)[keep]])
+    known = users >= 0
+    buckets, users = buckets[known], users[known]
+    stride = int(users.max()) + 1 if len(users) else 1
+    pairs = np.sort(buckets * stride + users)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+    active_users = np.bincount(pairs // stride, minlength=n_buckets)
+
+    return Trends(bucket, starts, [str(f) for f in features], star_counts, message_counts, active_users)
+
+
+def _kept(weights, keep):
+    return None if weights is None else np.asarray(weights, dtype=np.int64)[keep]
+
+
+def int_column(sql, params):
+    """ Run a one-column integer query straight into an array, skipping intermediate lists of rows. """
+    # iterate the DBAPI cursor itself: SQLAlchemy's result wrapper costs more per row than the query does
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        return np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64)
+    finally:
+        cursor.close()
+
+
+def compute_trends(start, end, bucket='day'):
+    """ Daily or weekly review, message and active-user trends for start..end inclusive. """
+    # created_at is an indexed text timestamp, so a string range on it is an index range scan
+    params = (start.isoformat(), (end + timedelta(days=1)).isoformat())
+    reviews = db.session.connection().exec_driver_sql(
+        f"SELECT {DAY_SQL.format(column='created_at')}, coalesce(feature, ''), stars, coalesce(user_id, -1) "
+        "FROM reviews WHERE created_at >= ? AND created_at < ?", params).all()
+    review_days, review_features, review_stars, review_users = zip(*reviews) if reviews else ((), (), (), ())
+    # the driver's per-row cost dominates at millions of rows, so each message comes back as a single
+    # integer: day number in the high 32 bits, sender id + 1 (0 for the bot) in the low 32
+    packed = int_column(
+        f"SELECT ({DAY_SQL.format(column='created_at')} << 32) + coalesce(sender_id, -1) + 1 "
+        "FROM messages WHERE created_at >= ? AND created_at < ?", params)
+    return aggregate_trends(start, end, bucket, review_days, review_features, review_stars, review_users,
+                            packed >> 32, (packed & 0xFFFFFFFF) - 1)
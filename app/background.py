@@ -0,0 +1,16 @@
+import threading
+from app import app
+
+
+def run_in_background(fn, *args, **kwargs):
+    """ Run fn(*args, **kwargs) on a daemon thread inside its own app context, so the request can return now. """
+    def target():
+        with app.app_context():
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                app.logger.exception('Background job %s failed', fn.__name__)
+
+    thread = threading.Thread(target=target, name=f'background-{fn.__name__}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,140 @@
+import threading
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+from typing import Callable, Optional
+from app import app, db
+from app.background import run_in_background
+from app.models import ConversationSummary, Message
+
+GEMINI_ROLES = {'user': 'user', 'bot': 'model'}
+
+
+def estimate_tokens(text):
+    # roughly four characters per token for English text; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def _content(role, text):
+    return {'role': role, 'parts': [{'text': text}]}
+
+
+def split_turns(messages, budget):
+    """
+    Split messages (newest first) into the most recent ones that fit in `budget` tokens, returned oldest
+    first, and the older remainder. The newest message is always kept even if it alone is over budget.
+    """
+    used = 0
+    for i, message in enumerate(messages):
+        used += estimate_tokens(message.content)
+        if used > budget and i > 0:
+            return messages[:i][::-1], messages[i:][::-1]
+    return messages[::-1], []
+
+
+_folding = set()
+_folding_lock = threading.Lock()
+
+
+def _schedule_fold(conversation_id, before_id, summarise):
+    # at most one fold per conversation at a time in this process; the conditional writes in fold_summary
+    # cover folds racing in other workers
+    with _folding_lock:
+        if conversation_id in _folding:
+            return
+        _folding.add(conversation_id)
+    run_in_background(_fold_in_background, conversation_id, before_id, summarise)
+
+
+def _fold_in_background(conversation_id, before_id, summarise):
+    try:
+        fold_summary(conversation_id, before_id, summarise)
+    finally:
+        with _folding_lock:
+            _folding.discard(conversation_id)
+
+
+def fold_summary(conversation_id, before_id, summarise: Callable[[Optional[str], list], str]):
+    """
+    Fold every message of the conversation between the stored summary and `before_id` into the summary
+    with summarise(previous_summary, messages), oldest first and CHAT_CONTEXT_SCAN_LIMIT messages per
+    call, so no message is skipped however many arrived since the last fold. Each chunk is committed on
+    its own and only if no other fold moved the summary meanwhile.
+    """
+    while True:
+        db.session.expire_all()
+        record = db.session.get(ConversationSummary, conversation_id)
+        after = record.last_message_id if record else 0
+        chunk = db.session.scalars(
+            sa.select(Message)
+            .where(Message.conversation_id == conversation_id, Message.id > after, Message.id < before_id)
+            .order_by(Message.id)
+            .limit(app.config['CHAT_CONTEXT_SCAN_LIMIT'])
+        ).all()
+        if not chunk:
+            return
+        values = dict(summary=summarise(record.summary if record else None, chunk), last_message_id=chunk[-1].id)
+        if record is None:
+            db.session.execute(insert(ConversationSummary).values(conversation_id=conversation_id, **values)
+                               .on_conflict_do_nothing())
+        else:
+            db.session.execute(sa.update(ConversationSummary)
+                               .where(ConversationSummary.conversation_id == conversation_id,
+                                      ConversationSummary.last_message_id == after)
+                               .values(**values))
+        db.session.commit()
+
+
+def build_contents(conversation_id, user_input, summarise: Callable[[Optional[str], list], str], writer=None):
+    """
+    Gemini `contents` for user_input with the conversation's earlier turns as context, or None if the
+    conversation has no history yet (so the prompt is context-free and safe to cache).
+
+    Recent turns are replayed verbatim within CHAT_CONTEXT_TOKEN_BUDGET. Once they overflow it, the
+    older ones are folded into the stored rolling summary by fold_summary on a background thread,
+    keeping only half the budget verbatim so the next few turns fit without another fold. Each message
+    is therefore summarised once, the prompt stays about the same size however long the chat runs, and
+    no reply waits for a summarise call; until a fold lands, the turns it covers are left out.
+
+    `writer` is the app.message_log.MessageWriter used for write-behind logging, if any: rows of the
+    conversation it still has queued are added as the newest turns.
+    """
+    budget = app.config['CHAT_CONTEXT_TOKEN_BUDGET']
+    scan_limit = app.config['CHAT_CONTEXT_SCAN_LIMIT']
+    record = db.session.get(ConversationSummary, conversation_id)
+    summary = record.summary if record else None
+    last_summarised = record.last_message_id if record else 0
+
+    def read():
+        return db.session.scalars(
+            sa.select(Message)
+            .where(Message.conversation_id == conversation_id, Message.id > last_summarised)
+            .order_by(Message.id.desc())
+            .limit(scan_limit)
+        ).all()
+
+    if writer is None:
+        recent, queued = read(), []
+    else:
+        recent, queued = writer.read_with_pending(conversation_id, read)
+    if not recent and not queued and summary is None:
+        return None
+
+    # queued rows have no id yet, so they are always sent verbatim and never folded into the summary
+    queued = [Message(**row) for row in queued]
+    budget -= sum(estimate_tokens(m.content) for m in queued)
+    turns, older = split_turns(recent, budget)
+    # a full scan may have stopped short of messages nobody has summarised yet
+    unscanned = len(recent) == scan_limit and db.session.scalar(sa.select(sa.exists().where(
+        Message.conversation_id == conversation_id, Message.id > last_summarised, Message.id < recent[-1].id)))
+    if older or unscanned:
+        if older:
+            turns, older = split_turns(recent, budget // 2)
+        _schedule_fold(conversation_id, turns[0].id, summarise)
+
+    contents = []
+    if summary:
+        contents.append(_content('user', f'Summary of our conversation so far: {summary}'))
+        contents.append(_content('model', 'Understood.'))
+    contents.extend(_content(GEMINI_ROLES[m.role], m.content) for m in turns + queued)
+    contents.append(_content('user', user_input))
+    return contents
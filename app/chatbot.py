@@ -2,14 +2,31 @@ from dotenv import load_dotenv
 import os
 from google import genai
 from flask_login import current_user
-from flask import url_for, session
-from app import db
-from app.models import Message
+from flask import url_for, session, has_request_context
+from app import app, db
+from app.models import Conversation, Message
+from app.response_cache import ResponseCache
+from app.intent_router import IntentRouter
+from app.message_log import message_writer
+from app.chat_context import build_contents
+from app.metrics import track_gemini, register_gauge
+from datetime import datetime, timezone
 
 load_dotenv()
 api_key = os.environ["GOOGLE_API_KEY"]
 client = genai.Client(api_key=api_key)
 
+GEMINI_MODEL = "gemini-2.0-flash"
+response_cache = ResponseCache(
+    maxsize=app.config['RESPONSE_CACHE_SIZE'],
+    ttl=app.config['RESPONSE_CACHE_TTL'],
+    path=app.config['RESPONSE_CACHE_PATH'],
+    disk_maxsize=app.config['RESPONSE_CACHE_DISK_SIZE'],
+)
+for _stat in ('hits', 'disk_hits', 'misses'):
+    register_gauge(f'chatbot_response_cache_{_stat}', f'Gemini reply cache {_stat.replace("_", " ")}.',
+                   lambda stat=_stat: response_cache.stats()[stat])
+
 
 FAQ_RESPONSES: dict[str,str] = {
     "how can i clear all conversation history?":
@@ -20,36 +37,122 @@ FAQ_RESPONSES: dict[str,str] = {
        "Sure. A human agent will contact you shortly."
 }
 
-def get_bot_response(user_input):
-    user_message_lower = user_input.lower()
-
-    if user_message_lower in FAQ_RESPONSES:
-        return FAQ_RESPONSES[user_message_lower]
-
-    elif "faq" in user_message_lower:
-        return f"You can find the faq section here: {url_for('faq', _external=True)}"
-    elif "resource" in user_message_lower:
-        return f"You can find the resources section here: {url_for('student_resources', _external=True)}"
-    elif "support" in user_message_lower:
-        return "If you need support, please contact us at support@uniss.com."
-    elif "review" in user_message_lower:
-        return f"You can leave a review here: {url_for('review', _external=True)}"
-    elif "report" in user_message_lower:
-        if current_user.is_authenticated and hasattr(current_user, 'role') and current_user.role == 'admin':
-            return f"You can access the trend report here: {url_for('trend_report', _external=True)}"
-        else:
-            return "Only administrators can access the trend report."
+# (keyword, intent) pairs in priority order; any number of keywords may share an intent
+KEYWORD_INTENTS: list[tuple[str, str]] = [
+    ("faq", "faq"),
+    ("resource", "resources"),
+    ("support", "support"),
+    ("review", "review"),
+    ("report", "report"),
+]
+
+def _trend_report_reply():
+    if current_user.is_authenticated and hasattr(current_user, 'role') and current_user.role == 'admin':
+        return f"You can access the trend report here: {url_for('trend_report', _external=True)}"
     else:
+        return "Only administrators can access the trend report."
+
+INTENT_REPLIES = {
+    "faq": lambda: f"You can find the faq section here: {url_for('faq', _external=True)}",
+    "resources": lambda: f"You can find the resources section here: {url_for('student_resources', _external=True)}",
+    "support": lambda: "If you need support, please contact us at support@uniss.com.",
+    "review": lambda: f"You can leave a review here: {url_for('review', _external=True)}",
+    "report": _trend_report_reply,
+}
+
+intent_router = IntentRouter(FAQ_RESPONSES, KEYWORD_INTENTS, threshold=app.config['CHATBOT_FAQ_THRESHOLD'])
+
+def get_local_response(user_input):
+    """ Answer from the FAQ table or keyword signposting; None means the message needs the LLM. """
+    route = intent_router.route(user_input)
+    if route is None:
+        return None
+    if route.kind == 'faq':
+        return FAQ_RESPONSES[route.key]
+    return INTENT_REPLIES[route.key]()
+
+def summarise_turns(previous_summary, messages):
+    """ Fold messages into the running summary of a conversation with one Gemini call. """
+    transcript = "\n".join(f"{'Student' if m.role == 'user' else 'Assistant'}: {m.content}" for m in messages)
+    prompt = (
+        "Update the summary of a student support chat with the new messages below. Keep the facts, feelings "
+        f"and requests the assistant should remember, in at most {app.config['CHAT_SUMMARY_MAX_WORDS']} words.\n\n"
+        f"Current summary: {previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+    )
+    with track_gemini('summarise'):
+        response = client.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    return response.text or previous_summary or ""
+
+def conversation_contents(user_input):
+    """ Prompt with the current conversation's context, or None when there is none and user_input stands alone. """
+    if not has_request_context() or not session.get("conversation_id"):
+        return None
+    # the previous turn may still be queued for writing; it is read from the queue rather than waited for
+    writer = message_writer if app.config['CHAT_LOG_WRITE_BEHIND'] else None
+    return build_contents(session["conversation_id"], user_input, summarise_turns, writer)
+
+def get_bot_response(user_input):
+    reply = get_local_response(user_input)
+    if reply is not None:
+        return reply
+
+    # only context-free prompts are cached; a reply that depends on earlier turns is specific to this chat
+    contents = conversation_contents(user_input)
+    if contents is None:
+        cached = response_cache.get(GEMINI_MODEL, user_input)
+        if cached is not None:
+            return cached
+    with track_gemini('generate_content'):
         response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=user_input,
+                model=GEMINI_MODEL,
+                contents=contents or user_input,
         )
-        return response.text
+    if response.text and contents is None:
+        response_cache.set(GEMINI_MODEL, user_input, response.text)
+    return response.text
 
-def chat_and_log(user_input):
-    bot_reply = get_bot_response(user_input)
+def stream_bot_response(user_input):
+    """ Like get_bot_response, but yields the Gemini reply chunk by chunk as it is generated. """
+    reply = get_local_response(user_input)
+    contents = None
+    if reply is None:
+        contents = conversation_contents(user_input)
+        if contents is None:
+            reply = response_cache.get(GEMINI_MODEL, user_input)
+    if reply is not None:
+        yield reply
+        return
 
+    chunks = []
+    with track_gemini('generate_content_stream'):
+        for chunk in client.models.generate_content_stream(model=GEMINI_MODEL, contents=contents or user_input):
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+    if chunks and contents is None:
+        response_cache.set(GEMINI_MODEL, user_input, "".join(chunks))
+
+def current_conversation_id():
+    """ The session's conversation, created on the first message rather than when the chatbot page loads. """
     conv_id = session.get("conversation_id")
+    if conv_id is None and current_user.is_authenticated:
+        conv = Conversation(user_id=current_user.id)
+        db.session.add(conv)
+        db.session.commit()
+        conv_id = session["conversation_id"] = conv.id
+    return conv_id
+
+def log_exchange(user_input, bot_reply):
+    conv_id = current_conversation_id()
+    if conv_id and app.config['CHAT_LOG_WRITE_BEHIND']:
+        now = datetime.now(timezone.utc)
+        rows = [
+            dict(conversation_id=conv_id, sender_id=current_user.id, role='user', content=user_input, created_at=now),
+            dict(conversation_id=conv_id, sender_id=None, role='bot', content=bot_reply, created_at=now),
+        ]
+        if message_writer.enqueue(rows, key=conv_id):
+            return
+        # queue is full: apply backpressure by writing on the request thread
     if conv_id:
         db.session.add_all(
             [
@@ -58,4 +161,16 @@ def chat_and_log(user_input):
             ]
         )
         db.session.commit()
-    return bot_reply
\ No newline at end of file
+
+def chat_and_log(user_input):
+    bot_reply = get_bot_response(user_input)
+    log_exchange(user_input, bot_reply)
+    return bot_reply
+
+def stream_and_log(user_input):
+    """ Yield reply chunks to the caller, then persist the complete exchange once the stream has finished. """
+    chunks = []
+    for chunk in stream_bot_response(user_input):
+        chunks.append(chunk)
+        yield chunk
+    log_exchange(user_input, "".join(chunks))
@@ -0,0 +1,77 @@
+import click
+import sqlalchemy as sa
+from app import app, db
+from app.rollups import rebuild_review_stats
+from app.debug_utils import seed_large_db
+from app.history import compact_conversations
+from app.tickets import migrate_ticket_messages
+from app.resource_search import install_resource_search
+from app.trend_rollups import fold_new_activity, rebuild_trend_rollups
+
+
+@app.cli.command('init-db')
+def init_db():
+    """ Create any tables or indexes missing from the current database and rebuild derived tables. Safe to re-run. """
+    db.create_all()
+    # create_all skips tables that already exist, so add columns and indexes introduced since they were created;
+    # new columns on existing tables must be nullable, as SQLite can't backfill them
+    inspector = sa.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = sa.schema.CreateColumn(column).compile(dialect=db.engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    migrate_ticket_messages()
+    install_resource_search()
+    rebuild_review_stats()
+    fold_new_activity()
+    click.echo('Database schema is up to date.')
+
+
+@app.cli.command('rebuild-review-stats')
+def rebuild_review_stats_command():
+    """ Recompute the per-feature review rollup from the reviews table. """
+    rebuild_review_stats()
+    click.echo('review_stats rebuilt.')
+
+
+@app.cli.command('track-trends')
+@click.option('--rebuild', is_flag=True, help='Empty the rollups and fold the whole history again.')
+def track_trends_command(rebuild):
+    """ Fold messages and reviews written since the last run into the trend rollups; cheap enough for cron. """
+    folded = rebuild_trend_rollups() if rebuild else fold_new_activity()
+    click.echo(', '.join(f'{source}: {covered} new ids' for source, covered in folded.items()) + '.')
+
+
+@app.cli.command('migrate-ticket-messages')
+def migrate_ticket_messages_command():
+    """ Move ticket messages out of the old JSON column into the ticket_messages table. """
+    click.echo(f'Moved {migrate_ticket_messages()} ticket messages.')
+
+
+@app.cli.command('compact-conversations')
+@click.option('--grace-seconds', default=3600, show_default=True, help='Keep empty conversations newer than this.')
+def compact_conversations_command(grace_seconds):
+    """ Delete conversations that have no messages. """
+    click.echo(f'Removed {compact_conversations(grace_seconds)} empty conversations.')
+
+
+@app.cli.command('seed-large')
+@click.option('--users', default=100_000, show_default=True)
+@click.option('--conversations', default=200_000, show_default=True)
+@click.option('--messages', default=2_000_000, show_default=True)
+@click.option('--reviews', default=100_000, show_default=True)
+@click.option('--tickets', default=20_000, show_default=True)
+@click.option('--sessions', default=50_000, show_default=True)
+@click.option('--resources', default=5_000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Random seed, for reproducible datasets.')
+def seed_large_command(users, conversations, messages, reviews, tickets, sessions, resources, seed):
+    """ Reset the database and fill it with a large synthetic dataset (demo accounts are kept). """
+    seed_large_db(users=users, conversations=conversations, messages=messages, reviews=reviews,
+                  tickets=tickets, sessions=sessions, resources=resources, seed=seed)
+    click.echo('Synthetic database created.')
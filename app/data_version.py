@@ -0,0 +1,29 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models import DataVersion, Message, Review
+
+# the trend report's inputs: any review or chat message written or deleted moves this counter
+TRENDS = 'trends'
+
+
+def bump_data_version(connection, name=TRENDS):
+    """
+    Increment a counter inside the caller's transaction. ORM writes to Review and Message do this
+    through the events below; Core bulk inserts and deletes bypass those and must call it themselves.
+    """
+    stmt = insert(DataVersion).values(name=name, version=1)
+    connection.execute(stmt.on_conflict_do_update(index_elements=['name'],
+                                                  set_={'version': DataVersion.version + 1}))
+
+
+def data_version(name=TRENDS):
+    return db.session.scalar(sa.select(DataVersion.version).where(DataVersion.name == name)) or 0
+
+
+@sa.event.listens_for(Review, 'after_insert')
+@sa.event.listens_for(Review, 'after_delete')
+@sa.event.listens_for(Message, 'after_insert')
+@sa.event.listens_for(Message, 'after_delete')
+def _bump_trends(mapper, connection, target):
+    bump_data_version(connection)
@@ -1,6 +1,15 @@
-from app import db
-from app.models import User, Review, Admin, Student, Counsellor
+from app import app, db
+from app.models import (User, Review, Admin, Student, Counsellor, Conversation, Message, Ticket, TicketMessage,
+                        CounsellingSession, Resource)
+from app.passwords import hash_password
+from app.rollups import rebuild_review_stats
+from app.data_version import bump_data_version
+from app.scheduling import slot_starts
+from app.trend_rollups import fold_new_activity
+from itertools import islice
 import datetime
+import random
+import sqlalchemy as sa
 
 
 def reset_db():
@@ -49,8 +58,124 @@ def reset_db():
 
 
     db.session.commit()
+    rebuild_review_stats()
+
+FEATURES = ['Chatbot', 'Trend Report', 'Review System', 'General']
+SPECIALISATIONS = ['General', 'Academic', 'Anxiety', 'Depression', 'Relationships', 'Career']
+USER_PHRASES = ['I feel stressed about exams', 'How do I book counselling?', 'Where are the resources?',
+                'I can\'t sleep before deadlines', 'Can I speak to a human agent?', 'How do I leave a review?']
+BOT_PHRASES = ['Here are some tips that may help.', 'You can find the resources section on the Resources page.',
+               'Sure! Please follow the procedures to book your counselling session.']
+RESOURCE_TOPICS = ['exam stress', 'sleep', 'time management', 'homesickness', 'anxiety', 'budgeting', 'burnout',
+                   'procrastination', 'friendships', 'mindfulness', 'exercise', 'revision', 'deadlines', 'loneliness']
+RESOURCE_WORDS = ('students often find that a short routine helps when workload and pressure build up during term '
+                  'talk to a counsellor or tutor early plan breaks sleep well eat regularly and keep in touch with '
+                  'friends family support services are available online and on campus every weekday').split()
+
+
+def _bulk_insert(table, columns, rows, chunk_size=50_000, timestamps=()):
+    """
+    DBAPI executemany of row tuples in fixed-size chunks, so memory stays flat however many rows are
+    generated. Columns listed in `timestamps` take Unix seconds and are formatted by SQLite itself.
+    """
+    values = ", ".join("datetime(?, 'unixepoch')" if c in timestamps else '?' for c in columns)
+    sql = f'INSERT INTO {table.name} ({", ".join(columns)}) VALUES ({values})'
+    conn = db.session.connection()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        conn.exec_driver_sql(sql, chunk)
+
+
+def seed_large_db(users=100_000, conversations=200_000, messages=2_000_000, reviews=100_000, tickets=20_000,
+                  sessions=50_000, resources=5_000, days=180, seed=0):
+    """
+    Reset the database and bulk-generate a production-sized dataset for profiling and benchmarks.
+    The demo accounts from reset_db() are kept; every synthetic user shares the password 'synthetic.pw',
+    hashed once up front, and rows go in through chunked executemany rather than one ORM object at a time.
+    """
+    reset_db()
+    rng = random.Random(seed)
+    end = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    start = end - days * 24 * 60 * 60
+
+    def random_time():
+        return rng.randrange(start, end)
+
+    first_id = (db.session.scalar(sa.select(sa.func.max(User.id))) or 0) + 1
+    password_hash = hash_password('synthetic.pw')
+    n_admins = max(1, users // 100)
+    n_counsellors = max(1, users // 25)
+    roles = (['Admin'] * n_admins + ['Counsellor'] * n_counsellors
+             + ['Student'] * (users - n_admins - n_counsellors))
+    ids_by_role = {'Admin': [], 'Counsellor': [], 'Student': []}
+    for offset, role in enumerate(roles):
+        ids_by_role[role].append(first_id + offset)
+
+    _bulk_insert(User.__table__, ['id', 'username', 'email', 'password_hash', 'role'], (
+        (first_id + offset, f'{role.lower()}_{first_id + offset}',
+         f'{role.lower()}_{first_id + offset}@synthetic.uniss.com', password_hash, role)
+        for offset, role in enumerate(roles)))
+    _bulk_insert(Admin.__table__, ['id', 'admin_level'], ((i, 1) for i in ids_by_role['Admin']))
+    _bulk_insert(Counsellor.__table__, ['id', 'specialisation'],
+                 ((i, rng.choice(SPECIALISATIONS)) for i in ids_by_role['Counsellor']))
+    _bulk_insert(Student.__table__, ['id', 'course_enrollments'], ((i, '[]') for i in ids_by_role['Student']))
+
+    students, counsellors = ids_by_role['Student'], ids_by_role['Counsellor']
+    conversation_users = [rng.choice(students) for _ in range(conversations)]
+    _bulk_insert(Conversation.__table__, ['id', 'user_id', 'created_at'],
+                 ((c + 1, user_id, random_time()) for c, user_id in enumerate(conversation_users)),
+                 timestamps={'created_at'})
+
+    def message_rows():
+        for m in range(messages):
+            conversation = m % conversations
+            if (m // conversations) % 2 == 0:
+                yield (conversation + 1, conversation_users[conversation], 'user', rng.choice(USER_PHRASES),
+                       random_time())
+            else:
+                yield conversation + 1, None, 'bot', rng.choice(BOT_PHRASES), random_time()
+    _bulk_insert(Message.__table__, ['conversation_id', 'sender_id', 'role', 'content', 'created_at'],
+                 message_rows(), timestamps={'created_at'})
+
+    _bulk_insert(Review.__table__, ['feature', 'stars', 'text', 'user_id', 'created_at'], (
+        (rng.choice(FEATURES), rng.choices(range(6), weights=[1, 2, 3, 5, 8, 6])[0], None, rng.choice(students),
+         random_time())
+        for _ in range(reviews)), timestamps={'created_at'})
+    ticket_students = [rng.choice(students) for _ in range(tickets)]
+    _bulk_insert(Ticket.__table__, ['student_id', 'counsellor_id', 'status'], (
+        (student, rng.choice(counsellors), rng.choice(['open', 'open', 'closed'])) for student in ticket_students))
+    # like conversations, the tables start empty so ticket ids are 1..tickets
+    _bulk_insert(TicketMessage.__table__, ['ticket_id', 'sender_id', 'content', 'created_at'], (
+        (ticket + 1, student, rng.choice(USER_PHRASES), random_time())
+        for ticket, student in enumerate(ticket_students)), timestamps={'created_at'})
+    # sessions sit on the booking grid and run into the booking horizon: past ones completed, the rest
+    # scheduled, never two scheduled ones for the same counsellor or student in a slot
+    now = datetime.datetime.fromtimestamp(end)
+    slots = list(slot_starts(datetime.datetime.fromtimestamp(start),
+                             now + datetime.timedelta(days=app.config['BOOKING_HORIZON_DAYS'])))
+    booked = set()
+
+    def session_rows():
+        for _ in range(sessions):
+            student, counsellor, slot = rng.choice(students), rng.choice(counsellors), rng.choice(slots)
+            if slot > now:
+                if (counsellor, slot) in booked or (student, slot) in booked:
+                    continue
+                booked.update({(counsellor, slot), (student, slot)})
+            # the same text SQLAlchemy writes, so the unique indexes compare seeded and booked sessions alike
+            yield student, counsellor, f'{slot:%Y-%m-%d %H:%M:%S.%f}', 'scheduled' if slot > now else 'completed'
+    _bulk_insert(CounsellingSession.__table__, ['student_id', 'counsellor_id', 'date_time', 'status'], session_rows())
+    _bulk_insert(Resource.__table__, ['title', 'description', 'last_updated'], (
+        (f'{rng.choice(RESOURCE_TOPICS).capitalize()}: guide {n}',
+         ' '.join(rng.choices(RESOURCE_WORDS + [rng.choice(RESOURCE_TOPICS)] * 3, k=80)), random_time())
+        for n in range(resources)), timestamps={'last_updated'})
+
+    bump_data_version(db.session.connection())
+    db.session.commit()
+    rebuild_review_stats()
+    fold_new_activity()
+
 
 if __name__ == '__main__':
-    from app import app
     with app.app_context():
         reset_db()
\ No newline at end of file
@@ -1,8 +1,12 @@
-from datetime import datetime
+import os
+from datetime import date, datetime, timedelta
 from typing import List, Any
-from app.chatbot import chat_and_log
+from app.chatbot import chat_and_log, stream_and_log
+from app.trend_rollups import fold_new_activity, rollup_trends
 from app import db
 from app.models import CounsellingSession
+from app.scheduling import claim_slot
+from app.tickets import open_ticket
 
 
 class Resource:
@@ -36,15 +40,9 @@ class CounsellingSession:
         self.status = status
 
     @staticmethod
-    def schedule_session(student, counsellor):
-        new_session = CounsellingSession(
-            student_id=student.id,
-            counsellor_id=counsellor.id,
-            status="scheduled",
-        )
-        db.session.add(new_session)
-        db.session.commit()
-        return new_session
+    def schedule_session(student, counsellor, start):
+        # None if either of them is already booked at `start`
+        return claim_slot(student, counsellor.id, start)
 
     def update_session_status(self, new_status: str):
         self.status = new_status
@@ -93,9 +91,14 @@ class PDFDocument:
         """Placeholder implementation; convert plain text to fake‑PDF bytes (UTF‑8)."""
         return PDFDocument(text.encode("utf-8"))
 
-    def save(self, file_path):
-        with open(file_path, "wb") as fp:
-            fp.write(self._bytes)
+    def save(self, file_path, chunk_size=64 * 1024):
+        # stream to a temporary name and rename, so a reader never sees a half-written file
+        partial = f"{file_path}.part"
+        view = memoryview(self._bytes)
+        with open(partial, "wb") as fp:
+            for start in range(0, len(view), chunk_size):
+                fp.write(view[start:start + chunk_size])
+        os.replace(partial, file_path)
 
 
 class Report:
@@ -106,19 +109,19 @@ class Report:
         self.generated_on = generated_on
 
     @staticmethod
-    def generate(student, trend_summary):
+    def generate(student, trend_summary, path=None):
+        now = datetime.now()
         header = (
             f"Report for {getattr(student, 'username', student)} "
-            f"generated on {datetime().isoformat()}"
+            f"generated on {now.isoformat()}"
         )
-        combined = header + "" + trend_summary
+        combined = header + "\n\n" + trend_summary
 
-        # Create placeholder PDF and save to /tmp
+        # Create placeholder PDF and save to /tmp unless the caller chose where (see app.report_jobs)
         pdf = PDFDocument.from_text(combined)
-        filename = (
-            f"report_{getattr(student, 'id', 'unknown')}_{datetime().date()}.pdf"
-        )
-        pdf.save(f"/tmp/{filename}")
+        if path is None:
+            path = f"/tmp/report_{getattr(student, 'id', 'unknown')}_{now.date()}.pdf"
+        pdf.save(path)
 
         return trend_summary
 
@@ -126,11 +129,16 @@ class Report:
 class TrendAnalyser:
     def __init__(self, trend_summary: str = ""):
         self.trend_summary = trend_summary
+        self.trends = None
 
-    def track_trends(self):
-        # Collect data and update the trend summary.
-        """ Placeholder implementation: actual trend tracking """
-        self.trend_summary = "Trends updated at " + datetime.now().isoformat()
+    def track_trends(self, start: date = None, end: date = None, bucket: str = 'day'):
+        # Collect data and update the trend summary; defaults to the last 30 days.
+        # Only messages and reviews written since the previous run are read; the rest comes from the rollups.
+        end = end or date.today()
+        start = start or end - timedelta(days=29)
+        fold_new_activity()
+        self.trends = rollup_trends(start, end, bucket)
+        self.trend_summary = self.trends.summary()
 
     def produce_summary(self):
         return self.trend_summary
@@ -145,14 +153,22 @@ class AIChatbot:
         self.internal_state = bot_reply
         return bot_reply
 
+    def chat_stream(self, user_input):
+        chunks = []
+        for chunk in stream_and_log(user_input):
+            chunks.append(chunk)
+            yield chunk
+        self.internal_state = "".join(chunks)
+
     @staticmethod
     def generate_recommendations(self, student: Any) -> List[Resource]:
         return []
 
-    @staticmethod
-    def create_ticket(self, student: Any):
-        new_ticket = Ticket(ticket_id=0, status="open")
-        return new_ticket
+    def create_ticket(self, student: Any, conversation_id=None):
+        content = "Asked to speak to a human from the chatbot"
+        if conversation_id is not None:
+            content += f" (conversation #{conversation_id})"
+        return open_ticket(student, content)
 
     def receive_feedback(self, student: Any, feedback: Any):
         # Done in review() in views.py
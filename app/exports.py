@@ -0,0 +1,93 @@
+import csv
+import io
+from datetime import datetime, time, timedelta
+import sqlalchemy as sa
+from app import db
+from app.models import Conversation, Message, Review, User
+from app.rollups import feature_filter
+
+# rows fetched from the cursor at a time, and approximate bytes of CSV sent per response chunk
+EXPORT_FETCH_SIZE = 2000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _as_stored(column):
+    # timestamps go out as SQLite stored them; parsing each one into a datetime only to print it back is
+    # most of the per-row cost of a large export
+    return sa.type_coerce(column, sa.String).label(column.key)
+
+
+def _review_query(feature):
+    q = sa.select(Review.id, _as_stored(Review.created_at), Review.feature, Review.stars, Review.text, Review.user_id)
+    if feature is not None:
+        q = q.where(feature_filter(feature))
+    return q, Review.id, Review.created_at
+
+
+def _message_query(feature):
+    q = sa.select(Message.id, _as_stored(Message.created_at), Message.conversation_id, Message.sender_id,
+                  Message.role, Message.content)
+    return q, Message.id, Message.created_at
+
+
+def _conversation_query(feature):
+    # per-conversation chatbot usage; each correlated subquery is a lookup on messages.conversation_id
+    q = (sa.select(Conversation.id, _as_stored(Conversation.created_at), Conversation.user_id, User.username,
+                   sa.select(sa.func.count(Message.id)).where(Message.conversation_id == Conversation.id)
+                   .scalar_subquery().label('message_count'),
+                   sa.select(sa.func.count(Message.id)).where(Message.conversation_id == Conversation.id,
+                                                               Message.role == 'user')
+                   .scalar_subquery().label('user_message_count'),
+                   sa.select(sa.func.max(_as_stored(Message.created_at)))
+                   .where(Message.conversation_id == Conversation.id).scalar_subquery().label('last_message_at'))
+         .outerjoin(User, User.id == Conversation.user_id))
+    return q, Conversation.id, Conversation.created_at
+
+
+# name -> (CSV header, query builder); the builder returns the select, its id and the column dates filter on
+EXPORTS = {
+    'reviews': (['id', 'created_at', 'feature', 'stars', 'text', 'user_id'], _review_query),
+    'messages': (['id', 'created_at', 'conversation_id', 'sender_id', 'role', 'content'], _message_query),
+    'conversations': (['id', 'created_at', 'user_id', 'username', 'message_count', 'user_message_count',
+                       'last_message_at'], _conversation_query),
+}
+
+
+def export_query(name, start=None, end=None, feature=None):
+    """ The select for an export, filtered to start..end inclusive; `feature` only narrows the reviews export. """
+    header, build = EXPORTS[name]
+    q, id_column, timestamp = build(feature)
+    if start is None and end is None:
+        # a whole-table export reads rows in storage order, which never needs a sort
+        return header, q.order_by(id_column)
+    if start is not None:
+        q = q.where(timestamp >= datetime.combine(start, time()))
+    if end is not None:
+        q = q.where(timestamp < datetime.combine(end + timedelta(days=1), time()))
+    # a date range follows the created_at index, so rows stream from an index range scan in date order
+    return header, q.order_by(timestamp)
+
+
+def csv_chunks(header, rows, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """ Encode rows as CSV, yielding a string roughly every `chunk_bytes` so the response flushes steadily. """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(name, start=None, end=None, feature=None):
+    """
+    Generate a CSV export chunk by chunk. Rows come off a streaming cursor EXPORT_FETCH_SIZE at a time
+    and are never collected, so memory stays flat however many rows match.
+    """
+    header, q = export_query(name, start, end, feature)
+    with db.engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_FETCH_SIZE).execute(q)
+        yield from csv_chunks(header, result)
@@ -5,7 +5,6 @@ from wtforms.validators import DataRequired, NumberRange, ValidationError, Equal
 from app.models import User
 from app import db
 from flask_login import current_user
-from werkzeug.security import check_password_hash
 
 
 class ChooseForm(FlaskForm):
@@ -71,7 +70,7 @@ class ChangeEmailForm(FlaskForm):
 
     @staticmethod
     def validate_password(self, field):
-        if not check_password_hash(current_user.password_hash, field.data):
+        if not current_user.check_password(field.data):
             raise ValidationError("Password is incorrect.")
 
 
@@ -83,5 +82,5 @@ class ResetPasswordForm(FlaskForm):
 
     @staticmethod
     def validate_current_password(self, field):
-        if not check_password_hash(current_user.password_hash, field.data):
+        if not current_user.check_password(field.data):
             raise ValidationError("Password is incorrect.")
\ No newline at end of file
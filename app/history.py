@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from app import app, db
+from app.background import run_in_background
+from app.data_version import bump_data_version
+from app.models import Conversation, ConversationSummary, Message
+from app.message_log import message_writer
+from app.trend_rollups import MESSAGES, retract
+
+
+def count_history(user_id):
+    q = (sa.select(sa.func.count(Message.id))
+         .join(Conversation, Message.conversation_id == Conversation.id)
+         .where(Conversation.user_id == user_id))
+    return db.session.scalar(q)
+
+
+def delete_history(user_id):
+    """ Delete every conversation of the user and their messages with set-based statements in one transaction. """
+    message_writer.flush()  # don't let queued write-behind rows land after the delete
+    conversation_ids = sa.select(Conversation.id).where(Conversation.user_id == user_id)
+    retract(db.session.connection(), MESSAGES, Message.conversation_id.in_(conversation_ids))
+    db.session.execute(sa.delete(Message).where(Message.conversation_id.in_(conversation_ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(sa.delete(ConversationSummary).where(ConversationSummary.conversation_id.in_(conversation_ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(sa.delete(Conversation).where(Conversation.user_id == user_id),
+                       execution_options={'synchronize_session': False})
+    bump_data_version(db.session.connection())
+    db.session.commit()
+
+
+def history_cutoff():
+    """ The newest conversation and message ids now, taken when a delete is requested to bound what it removes. """
+    return (db.session.scalar(sa.select(sa.func.max(Conversation.id))) or 0,
+            db.session.scalar(sa.select(sa.func.max(Message.id))) or 0)
+
+
+def delete_history_chunked(user_id, cutoff, chunk_size=500):
+    """
+    Same result as delete_history, but `chunk_size` conversations per transaction so a very large
+    history never holds the SQLite write lock for long. Intended to run via run_in_background.
+    Only conversations and messages up to `cutoff` (from history_cutoff, at request time) are deleted:
+    whatever the user writes while this runs is kept, along with any older conversation it went into.
+    """
+    last_conversation, last_message = cutoff
+    message_writer.flush()
+    after = 0
+    while True:
+        ids = db.session.scalars(
+            sa.select(Conversation.id)
+            .where(Conversation.user_id == user_id, Conversation.id > after, Conversation.id <= last_conversation)
+            .order_by(Conversation.id).limit(chunk_size)).all()
+        if not ids:
+            break
+        after = ids[-1]
+        messages = sa.and_(Message.conversation_id.in_(ids), Message.id <= last_message)
+        retract(db.session.connection(), MESSAGES, messages)
+        db.session.execute(sa.delete(Message).where(messages), execution_options={'synchronize_session': False})
+        db.session.execute(sa.delete(ConversationSummary).where(ConversationSummary.conversation_id.in_(ids)),
+                           execution_options={'synchronize_session': False})
+        db.session.execute(sa.delete(Conversation).where(
+            Conversation.id.in_(ids), ~sa.exists().where(Message.conversation_id == Conversation.id)),
+            execution_options={'synchronize_session': False})
+        bump_data_version(db.session.connection())
+        db.session.commit()
+
+
+def compact_conversations(grace_seconds=3600, chunk_size=1000):
+    """
+    Delete conversations that never received a message, left behind by page loads before conversations
+    were created lazily. Ones newer than grace_seconds are kept, since their first write-behind message
+    may still be queued. Returns the number of conversations removed.
+    """
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=grace_seconds)
+    empty = (sa.select(Conversation.id)
+             .where(Conversation.created_at < cutoff,
+                    ~sa.exists().where(Message.conversation_id == Conversation.id))
+             .limit(chunk_size))
+    removed = 0
+    while True:
+        deleted = db.session.execute(sa.delete(Conversation).where(Conversation.id.in_(empty)),
+                                     execution_options={'synchronize_session': False}).rowcount
+        db.session.commit()
+        removed += deleted
+        if deleted < chunk_size:
+            return removed
+
+
+_last_compaction = None
+_compaction_lock = threading.Lock()
+
+
+def schedule_compaction():
+    """ Start compact_conversations in the background at most once per CONVERSATION_COMPACT_INTERVAL per process. """
+    global _last_compaction
+    with _compaction_lock:
+        now = time.monotonic()
+        if _last_compaction is not None and now - _last_compaction < app.config['CONVERSATION_COMPACT_INTERVAL']:
+            return
+        _last_compaction = now
+    run_in_background(compact_conversations, app.config['CONVERSATION_COMPACT_GRACE_SECONDS'])
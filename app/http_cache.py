@@ -0,0 +1,36 @@
+from flask import request, current_app
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+
+def page_etag(*parts):
+    # pages include the signed-in user's navbar, so the same URL differs between users
+    user_id = current_user.get_id() if current_user.is_authenticated else 'anon'
+    return '-'.join(str(p) for p in (user_id, *parts))
+
+
+def not_modified(etag, last_modified=None):
+    """
+    A 304 response if the request's If-None-Match/If-Modified-Since validators are still current,
+    otherwise None. Call it before querying or rendering anything the validators don't need.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """ Attach the validators and the cache policy for pages that are only shown to signed-in users. """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # private: a shared proxy must not serve one user's page to another, since access depends on the login
+    response.cache_control.private = True
+    max_age = current_app.config['RESOURCE_CACHE_MAX_AGE']
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,160 @@
+import math
+from collections import Counter, deque
+from difflib import SequenceMatcher
+from typing import NamedTuple, Optional
+from app.query_sketch import normalise_query
+
+
+# a near-miss FAQ match is only trusted if the message adds no negation and at most MAX_UNCOVERED_WORDS
+# words of its own: "I cannot make an appointment" or "... about self harm" are not the FAQ question
+NEGATIONS = frozenset({'no', 'not', 'never', 'nor', 'cannot', 'cant', 'dont', 'wont', 'unable',
+                       't'})  # what normalise_query leaves of n't
+FILLER_WORDS = frozenset({'a', 'an', 'the', 'i', 'me', 'my', 'you', 'your', 'it', 'is', 'do', 'can', 'could',
+                          'would', 'how', 'what', 'to', 'for', 'of', 'on', 'in', 'with', 'about', 'and', 'please'})
+MAX_UNCOVERED_WORDS = 1
+# spelling variants such as counseling/counselling still count as the question's word
+SIMILAR_WORD_RATIO = 0.8
+
+
+class Route(NamedTuple):
+    kind: str   # 'faq' or 'keyword'
+    key: str    # FAQ question or intent name
+    score: float
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over (keyword, intent) pairs given in priority order.
+    One pass over the message finds every keyword occurrence, so the cost does not grow with the
+    number of intents; the earliest-listed matching keyword wins, like the old elif chain.
+    """
+
+    def __init__(self, keywords: list[tuple[str, str]]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # best (lowest) priority of any keyword ending at each state, following fail links
+        self._output: list[Optional[int]] = [None]
+        self._intents = [intent for _, intent in keywords]
+
+        for priority, (keyword, _) in enumerate(keywords):
+            state = 0
+            for ch in keyword.lower():
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._goto[state][ch] = nxt
+                state = nxt
+            if self._output[state] is None:
+                self._output[state] = priority
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                inherited = self._output[self._fail[nxt]]
+                if inherited is not None and (self._output[nxt] is None or inherited < self._output[nxt]):
+                    self._output[nxt] = inherited
+
+    def match(self, text) -> Optional[str]:
+        """ Intent of the highest-priority keyword occurring anywhere in `text`, or None. """
+        best = None
+        state = 0
+        for ch in text.lower():
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            found = self._output[state]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return None if best is None else self._intents[best]
+
+
+class FaqMatcher:
+    """
+    TF-IDF cosine similarity over character trigrams of the normalised FAQ questions.
+    Vectors are precomputed and L2-normalised; an inverted index from trigram to (question, weight)
+    means a lookup only touches questions that share a trigram with the message.
+    """
+
+    NGRAM = 3
+
+    def __init__(self, questions):
+        self.questions = list(questions)
+        grams_per_question = [self._grams(normalise_query(q)) for q in self.questions]
+        doc_freq = Counter(gram for grams in grams_per_question for gram in grams)
+        n = len(self.questions)
+        self._idf = {gram: math.log((1 + n) / (1 + df)) + 1 for gram, df in doc_freq.items()}
+        self._unseen_idf = math.log(1 + n) + 1
+
+        self._index: dict[str, list[tuple[int, float]]] = {}
+        for doc, grams in enumerate(grams_per_question):
+            for gram, weight in self._vector(grams).items():
+                self._index.setdefault(gram, []).append((doc, weight))
+
+    def _grams(self, text):
+        padded = f' {text} '
+        return Counter(padded[i:i + self.NGRAM] for i in range(len(padded) - self.NGRAM + 1))
+
+    def _vector(self, grams):
+        weights = {gram: count * self._idf.get(gram, self._unseen_idf) for gram, count in grams.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {gram: w / norm for gram, w in weights.items()}
+
+    def best_match(self, text) -> tuple[Optional[str], float]:
+        vector = self._vector(self._grams(normalise_query(text)))
+        scores: dict[int, float] = {}
+        for gram, weight in vector.items():
+            for doc, doc_weight in self._index.get(gram, ()):
+                scores[doc] = scores.get(doc, 0.0) + weight * doc_weight
+        if not scores:
+            return None, 0.0
+        doc = max(scores, key=scores.get)
+        return self.questions[doc], scores[doc]
+
+
+def covers(question, text):
+    """ Whether `text` asks no more than `question`: no added negation and little content of its own. """
+    question_words = normalise_query(question).split()
+    words = normalise_query(text).split()
+    if NEGATIONS.intersection(words).difference(question_words):
+        return False
+    uncovered = [word for word in words if word not in FILLER_WORDS and not any(
+        SequenceMatcher(None, word, known).ratio() >= SIMILAR_WORD_RATIO for known in question_words)]
+    return len(uncovered) <= MAX_UNCOVERED_WORDS
+
+
+class IntentRouter:
+    """
+    Precompiled router for chatbot messages: exact FAQ hit, then a confident near-miss FAQ match,
+    then keyword signposting. A None result means the message should go to the LLM.
+    """
+
+    def __init__(self, faqs, keywords: list[tuple[str, str]], threshold=0.7):
+        self.threshold = threshold
+        self._exact = {normalise_query(q): q for q in faqs}
+        self._faqs = FaqMatcher(faqs)
+        self._keywords = KeywordAutomaton(keywords)
+
+    def route(self, text) -> Optional[Route]:
+        question = self._exact.get(normalise_query(text))
+        if question is not None:
+            return Route('faq', question, 1.0)
+
+        question, score = self._faqs.best_match(text)
+        if question is not None and score >= self.threshold and covers(question, text):
+            return Route('faq', question, score)
+
+        intent = self._keywords.match(text)
+        if intent is not None:
+            return Route('keyword', intent, 1.0)
+        return None
@@ -0,0 +1,186 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import sqlalchemy as sa
+from app import app, db
+from app.models import Message
+from app.data_version import bump_data_version
+
+
+class MessageWriter:
+    """
+    Write-behind buffer for chatbot Message rows.
+    Requests enqueue rows and return immediately; a background thread hands them to `write_batch`
+    in bulk once `batch_size` rows are waiting or `flush_seconds` have passed. The queue is bounded:
+    when it is full, enqueue() waits up to `enqueue_timeout` and then reports failure so the caller
+    can fall back to a synchronous write instead of growing memory without limit.
+    A failed batch (e.g. "database is locked") is retried `retries` times with exponential backoff
+    from `retry_backoff` seconds, then written one enqueued group at a time so only a group that still
+    fails is dropped.
+
+    Each group may carry a key (the conversation id); read_with_pending(key, ...) lets a reader see that
+    key's rows before they reach the database, without waiting for the rest of the queue.
+    """
+
+    def __init__(self, write_batch, max_queue=1000, batch_size=200, flush_seconds=1.0, enqueue_timeout=0.05,
+                 retries=3, retry_backoff=0.2):
+        self.write_batch = write_batch
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        # key -> groups enqueued but not yet written, the groups being written right now, and a counter
+        # bumped as each write starts and ends (odd while one is running) for read_with_pending to compare
+        self._pending: dict = {}
+        self._writing = []
+        self._pending_lock = threading.Lock()
+        self._writes = 0
+
+    def _ensure_started(self):
+        # started lazily (and again after a fork) so each gunicorn worker gets its own flusher thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._stop.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, rows, key=None):
+        """ Queue a list of rows to be written together. Returns False if the queue stayed full. """
+        self._ensure_started()
+        with self._pending_lock:
+            self._pending.setdefault(key, []).append(rows)
+        try:
+            self._queue.put((key, rows), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._forget([(key, rows)])
+            return False
+        return True
+
+    def _forget(self, groups):
+        with self._pending_lock:
+            for key, rows in groups:
+                waiting = self._pending.get(key, [])
+                waiting[:] = [other for other in waiting if other is not rows]
+                if not waiting:
+                    self._pending.pop(key, None)
+
+    def _queued(self, key, exclude=()):
+        return [row for rows in self._pending.get(key, ()) if not any(rows is other for _, other in exclude)
+                for row in rows]
+
+    def pending(self, key):
+        """ Rows queued under `key` and not yet written, oldest first, and the write counter they were taken at. """
+        with self._pending_lock:
+            return self._queued(key), self._writes
+
+    def read_with_pending(self, key, read, attempts=3):
+        """
+        Return (read(), rows queued under `key`) such that no row shows up twice: read() is a database
+        query, and the queued rows are the ones it can't have seen. Nothing is locked while read() runs;
+        if a write was running or started meanwhile, the snapshot may overlap the result and the read is
+        repeated. After `attempts`, rows whose write is still running are left out, so an exchange may be
+        missing from the context for one turn but is never sent twice.
+        """
+        for _ in range(attempts):
+            queued, writes = self.pending(key)
+            result = read()
+            with self._pending_lock:
+                if self._writes == writes and writes % 2 == 0:
+                    return result, queued
+        with self._pending_lock:
+            return result, self._queued(key, exclude=self._writing)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            groups, size = [first], len(first[1])
+            deadline = time.monotonic() + self.flush_seconds
+            while size < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and self._queue.empty():
+                    break
+                try:
+                    groups.append(self._queue.get(timeout=max(remaining, 0)))
+                    size += len(groups[-1][1])
+                except queue.Empty:
+                    break
+            try:
+                self._write(groups)
+            finally:
+                for _ in groups:
+                    self._queue.task_done()
+
+    def _commit(self, groups, rows):
+        with self._pending_lock:
+            self._writes += 1
+            self._writing = groups
+        try:
+            self.write_batch(rows)
+            self._forget(groups)
+        finally:
+            with self._pending_lock:
+                self._writes += 1
+                self._writing = []
+
+    def _write(self, groups):
+        batch = [row for _, rows in groups for row in rows]
+        for attempt in range(self.retries + 1):
+            try:
+                self._commit(groups, batch)
+                return
+            except Exception:
+                if attempt == self.retries:
+                    break
+                app.logger.warning('Bulk insert of %d chat messages failed, retrying', len(batch), exc_info=True)
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        # the batch keeps failing: write each exchange on its own so one bad row doesn't take the rest with it
+        for group in groups:
+            try:
+                self._commit([group], group[1])
+            except Exception:
+                app.logger.exception('Dropped %d chat messages after a failed insert', len(group[1]))
+                self._forget([group])
+
+    def flush(self):
+        """ Block until everything queued so far has been written. """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join()
+
+
+def insert_messages(rows):
+    with app.app_context():
+        db.session.execute(sa.insert(Message), rows)
+        # Core inserts skip the ORM events that normally move the trends version
+        bump_data_version(db.session.connection())
+        db.session.commit()
+
+
+message_writer = MessageWriter(
+    insert_messages,
+    max_queue=app.config['CHAT_LOG_QUEUE_SIZE'],
+    batch_size=app.config['CHAT_LOG_BATCH_SIZE'],
+    flush_seconds=app.config['CHAT_LOG_FLUSH_SECONDS'],
+    enqueue_timeout=app.config['CHAT_LOG_ENQUEUE_TIMEOUT'],
+    retries=app.config['CHAT_LOG_RETRIES'],
+    retry_backoff=app.config['CHAT_LOG_RETRY_BACKOFF'],
+)
+atexit.register(message_writer.close)
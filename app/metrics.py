@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+import sqlalchemy as sa
+from flask import g, request, has_app_context
+from app import app, db
+
+# Prometheus-style upper bounds, in seconds (counts for SQL statements per request)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series: dict[str, list] = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                labels = f'{self.label}="{label_value}"'
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+                lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:.6f}')
+                lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+requests_total = Counter('http_requests_total', 'Requests handled, sampled or not.', 'endpoint')
+request_latency = Histogram('http_request_duration_seconds', 'Sampled request latency.', LATENCY_BUCKETS, 'endpoint')
+request_sql_count = Histogram('http_request_sql_statements', 'SQL statements per sampled request.',
+                              SQL_COUNT_BUCKETS, 'endpoint')
+request_sql_time = Histogram('http_request_sql_seconds', 'Time spent in SQL per sampled request.',
+                             LATENCY_BUCKETS, 'endpoint')
+request_gemini_time = Histogram('http_request_gemini_seconds', 'Time spent waiting on Gemini per sampled request.',
+                                LATENCY_BUCKETS, 'endpoint')
+gemini_latency = Histogram('gemini_call_duration_seconds', 'Duration of Gemini API calls.', LATENCY_BUCKETS, 'call')
+
+# (name, help, callable) for values owned by other modules, e.g. cache hit counters
+_gauges: list[tuple[str, str, Callable[[], float]]] = []
+
+
+def register_gauge(name, help_text, read_value):
+    _gauges.append((name, help_text, read_value))
+
+
+@contextmanager
+def track_gemini(call):
+    """ Time a Gemini API call; also charged to the current request if it is being sampled. """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        gemini_latency.observe(call, elapsed)
+        if has_app_context() and g.get('metrics') is not None:
+            g.metrics['gemini_seconds'] += elapsed
+
+
+@app.before_request
+def start_request_metrics():
+    if random.random() < app.config['METRICS_SAMPLE_RATE']:
+        g.metrics = {'start': time.perf_counter(), 'sql_count': 0, 'sql_seconds': 0.0, 'gemini_seconds': 0.0}
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    endpoint = request.endpoint or 'unmatched'
+    requests_total.inc(endpoint)
+    metrics = g.pop('metrics', None)
+    if metrics is None:
+        return
+    request_latency.observe(endpoint, time.perf_counter() - metrics['start'])
+    request_sql_count.observe(endpoint, metrics['sql_count'])
+    request_sql_time.observe(endpoint, metrics['sql_seconds'])
+    if metrics['gemini_seconds']:
+        request_gemini_time.observe(endpoint, metrics['gemini_seconds'])
+
+
+with app.app_context():
+    @sa.event.listens_for(db.engine, 'before_cursor_execute')
+    def _sql_started(conn, cursor, statement, parameters, context, executemany):
+        if has_app_context() and g.get('metrics') is not None:
+            conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @sa.event.listens_for(db.engine, 'after_cursor_execute')
+    def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_started')
+        if not started or not has_app_context() or g.get('metrics') is None:
+            return
+        g.metrics['sql_count'] += 1
+        g.metrics['sql_seconds'] += time.perf_counter() - started.pop()
+
+
+def render_metrics():
+    """ All metrics in the Prometheus text exposition format (values are per worker process). """
+    lines = []
+    for metric in (requests_total, request_latency, request_sql_count, request_sql_time, request_gemini_time,
+                   gemini_latency):
+        lines.extend(metric.render())
+    for name, help_text, read_value in _gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {read_value()}']
+    return '\n'.join(lines) + '\n'
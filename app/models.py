@@ -5,8 +5,9 @@ from flask_login import UserMixin
 from sqlalchemy import ForeignKey
 from sqlalchemy.testing.schema import mapped_column
 from sqlalchemy.orm import relationship
-from werkzeug.security import generate_password_hash, check_password_hash
-from app import db, login
+from app.passwords import hash_password, verify_password, needs_rehash
+from app import app, db, login
+from app.user_cache import UserCache
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -36,10 +37,13 @@ class User(UserMixin, db.Model):
         return f'User(id={self.id}, username={self.username}, email={self.email}, role={self.role}, pwh={pwh})'
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
 class Admin(User):
     __tablename__ = 'admins'
@@ -62,7 +66,7 @@ class Student(User):
 class Counsellor(User):
     __tablename__ = 'counsellors'
     id: so.Mapped[int] = so.mapped_column(ForeignKey('users.id'), primary_key=True)
-    specialisation: so.Mapped[str] = so.mapped_column(sa.String(128))
+    specialisation: so.Mapped[str] = so.mapped_column(sa.String(128), index=True)
 
     __mapper_args__ = {
         'polymorphic_identity': 'Counsellor'
@@ -72,10 +76,15 @@ class Counsellor(User):
 # User 1-n Review relationship
 class Review(db.Model):
     __tablename__ = 'reviews'
+    # manage_reviews filters by feature and pages by id
+    __table_args__ = (sa.Index('ix_reviews_feature_id', 'feature', 'id'),)
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     feature: so.Mapped[Optional[str]] = so.mapped_column(sa.String(256))
     text: so.Mapped[Optional[str]] = so.mapped_column(sa.String(1024))
     stars: so.Mapped[int] = so.mapped_column()
+    # reviews written before this column existed have no timestamp and are left out of app.analytics trends
+    created_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), default=sa.func.now(),
+                                                                 index=True)
     user_id: so.Mapped[Optional[int]]  = mapped_column(ForeignKey('users.id', ondelete='SET NULL'))
     user: so.Mapped[Optional['User']] = relationship(back_populates='reviews')
 
@@ -83,19 +92,60 @@ class Review(db.Model):
         return f'Review(stars={self.stars}, text="{self.text}", user_id={self.user_id})'
 
 
+# Per-feature rollup of Review, kept in step by app.rollups so the trend report never scans reviews
+class ReviewStat(db.Model):
+    __tablename__ = 'review_stats'
+    feature: so.Mapped[str] = so.mapped_column(sa.String(256), primary_key=True)
+    review_count: so.Mapped[int] = so.mapped_column(default=0)
+    star_sum: so.Mapped[int] = so.mapped_column(default=0)
+    # star histogram, one column per rating the ReviewForm allows
+    stars_0: so.Mapped[int] = so.mapped_column(default=0)
+    stars_1: so.Mapped[int] = so.mapped_column(default=0)
+    stars_2: so.Mapped[int] = so.mapped_column(default=0)
+    stars_3: so.Mapped[int] = so.mapped_column(default=0)
+    stars_4: so.Mapped[int] = so.mapped_column(default=0)
+    stars_5: so.Mapped[int] = so.mapped_column(default=0)
+
+    @property
+    def average(self) -> float:
+        return self.star_sum / self.review_count if self.review_count else 0
+
+    @property
+    def histogram(self) -> list[int]:
+        return [getattr(self, f'stars_{s}') for s in range(6)]
+
+    def __repr__(self):
+        return f'ReviewStat(feature="{self.feature}", count={self.review_count}, sum={self.star_sum})'
+
+
+# Shared heavy-hitters table for chatbot queries, merged into by every worker's app.query_sketch buffer
+class QueryCount(db.Model):
+    __tablename__ = 'query_counts'
+    text: so.Mapped[str] = so.mapped_column(sa.String(256), primary_key=True)
+    count: so.Mapped[int] = so.mapped_column(default=0, index=True)
+    # Space-Saving over-estimation bound carried over from evicted counters
+    error: so.Mapped[int] = so.mapped_column(default=0)
+
+    def __repr__(self):
+        return f'QueryCount(text="{self.text}", count={self.count}, error={self.error})'
+
+
 # User 1-n Conversation 1-n Message
 class Conversation(db.Model):
     __tablename__ = "conversations"
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
-    user_id: so.Mapped[int] = so.mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
-    created_at: so.Mapped[datetime] = so.mapped_column(default=sa.func.now())
+    user_id: so.Mapped[int] = so.mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    # app.exports streams date-filtered conversations in created_at order
+    created_at: so.Mapped[datetime] = so.mapped_column(default=sa.func.now(), index=True)
     user: so.Mapped["User"] = relationship(back_populates="conversations")
     messages: so.Mapped[list["Message"]] = relationship(back_populates="conversation", cascade="all, delete-orphan")
 
 class Message(db.Model):
     __tablename__ = "messages"
+    # covers app.analytics' date-range scans, which then never touch the table rows
+    __table_args__ = (sa.Index("ix_messages_created_at_sender_id", "created_at", "sender_id"),)
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
-    conversation_id: so.Mapped[int] = so.mapped_column(ForeignKey("conversations.id", ondelete="CASCADE"))
+    conversation_id: so.Mapped[int] = so.mapped_column(ForeignKey("conversations.id", ondelete="CASCADE"), index=True)
     sender_id: so.Mapped[Optional[int]] = so.mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     role: so.Mapped[Literal["user", "bot"]] = so.mapped_column(sa.Enum("user", "bot", name="msg_role", native_enum=False), nullable=False,)
     content: so.Mapped[str] = so.mapped_column(sa.Text, nullable=False)
@@ -103,6 +153,82 @@ class Message(db.Model):
     conversation: so.Mapped["Conversation"] = relationship(back_populates="messages")
     sender: so.Mapped[Optional["User"]] = relationship(back_populates="messages")
 
+# Monotonic counters of changes to a group of tables, see app.data_version
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+    name: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    version: so.Mapped[int] = so.mapped_column(default=0)
+
+
+# Rendered page fragments shared by every worker process, see app.page_cache
+class PageCache(db.Model):
+    __tablename__ = "page_cache"
+    key: so.Mapped[str] = so.mapped_column(sa.String(256), primary_key=True)
+    # the data version the entry was rendered for, so superseded entries can be dropped on the next write
+    version_name: so.Mapped[str] = so.mapped_column(sa.String(64), server_default='')
+    version: so.Mapped[int] = so.mapped_column()
+    # indexed so writes can trim the table to its newest entries
+    rendered_at: so.Mapped[float] = so.mapped_column(index=True)
+    body: so.Mapped[str] = so.mapped_column(sa.Text)
+
+
+# Daily rollups of messages and reviews, folded in incrementally by app.trend_rollups; day is days since 1970-01-01
+class TrendDay(db.Model):
+    __tablename__ = "trend_days"
+    day: so.Mapped[int] = so.mapped_column(primary_key=True)
+    messages: so.Mapped[int] = so.mapped_column(default=0)
+
+
+class TrendReviewDay(db.Model):
+    __tablename__ = "trend_review_days"
+    day: so.Mapped[int] = so.mapped_column(primary_key=True)
+    feature: so.Mapped[str] = so.mapped_column(sa.String(256), primary_key=True)
+    stars: so.Mapped[int] = so.mapped_column(primary_key=True)
+    reviews: so.Mapped[int] = so.mapped_column(default=0)
+
+
+# messages and reviews each user wrote on a day; a row exists while the user counts as active that day
+class TrendUserDay(db.Model):
+    __tablename__ = "trend_user_days"
+    day: so.Mapped[int] = so.mapped_column(primary_key=True)
+    user_id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    events: so.Mapped[int] = so.mapped_column(default=0)
+
+
+# highest Message.id / Review.id already folded into the trend rollups
+class TrendWatermark(db.Model):
+    __tablename__ = "trend_watermarks"
+    source: so.Mapped[str] = so.mapped_column(sa.String(32), primary_key=True)
+    last_id: so.Mapped[int] = so.mapped_column(default=0)
+
+
+# Report rendering requests run by app.report_jobs; `key` (student and day) makes identical requests share one row,
+# data_version records the trends version the report was requested at
+class ReportJob(db.Model):
+    __tablename__ = "report_jobs"
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    key: so.Mapped[str] = so.mapped_column(sa.String(128), unique=True)
+    student_id: so.Mapped[int] = so.mapped_column(ForeignKey("students.id", ondelete="CASCADE"), index=True)
+    data_version: so.Mapped[int] = so.mapped_column()
+    status: so.Mapped[str] = so.mapped_column(sa.String(16), default="queued")
+    path: so.Mapped[Optional[str]] = so.mapped_column(sa.String(512))
+    error: so.Mapped[Optional[str]] = so.mapped_column(sa.Text)
+    created_at: so.Mapped[datetime] = so.mapped_column(default=sa.func.now())
+    updated_at: so.Mapped[datetime] = so.mapped_column(default=sa.func.now(), onupdate=sa.func.now())
+
+    def __repr__(self):
+        return f'ReportJob(id={self.id}, key="{self.key}", status={self.status})'
+
+
+# Rolling summary of a conversation's messages up to and including last_message_id, see app.chat_context
+class ConversationSummary(db.Model):
+    __tablename__ = "conversation_summaries"
+    conversation_id: so.Mapped[int] = so.mapped_column(ForeignKey("conversations.id", ondelete="CASCADE"),
+                                                       primary_key=True)
+    summary: so.Mapped[str] = so.mapped_column(sa.Text, nullable=False)
+    last_message_id: so.Mapped[int] = so.mapped_column(nullable=False)
+    updated_at: so.Mapped[datetime] = so.mapped_column(default=sa.func.now(), onupdate=sa.func.now())
+
 
 class Resource(db.Model):
     __tablename__ = "resources"
@@ -110,10 +236,12 @@ class Resource(db.Model):
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     title: so.Mapped[str] = so.mapped_column(sa.String(256), nullable=False)
     description: so.Mapped[Optional[str]] = so.mapped_column(sa.Text)
+    # indexed so the resource list's collection version (max last_updated) is a single index lookup
     last_updated: so.Mapped[datetime] = so.mapped_column(
         sa.DateTime(timezone=True),
         default=sa.func.now(),
-        onupdate=sa.func.now()
+        onupdate=sa.func.now(),
+        index=True
     )
 
     def __repr__(self) -> str:
@@ -122,6 +250,13 @@ class Resource(db.Model):
 
 class CounsellingSession(db.Model):
     __tablename__ = "counselling_sessions"
+    # at most one scheduled session per counsellor, and per student, in each slot of app.scheduling's grid
+    __table_args__ = (
+        sa.Index("uq_counselling_sessions_counsellor_slot", "counsellor_id", "date_time", unique=True,
+                 sqlite_where=sa.text("status = 'scheduled'")),
+        sa.Index("uq_counselling_sessions_student_slot", "student_id", "date_time", unique=True,
+                 sqlite_where=sa.text("status = 'scheduled'")),
+    )
 
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     student_id: so.Mapped[int] = so.mapped_column(ForeignKey("students.id", ondelete="CASCADE"))
@@ -140,20 +275,57 @@ class Ticket(db.Model):
     __tablename__ = "tickets"
 
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
-    student_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey("students.id", ondelete="CASCADE"))
-    counsellor_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey("counsellors.id", ondelete="SET NULL"))
+    student_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey("students.id", ondelete="CASCADE"), index=True)
+    counsellor_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey("counsellors.id", ondelete="SET NULL"),
+                                                               index=True)
     status: so.Mapped[str] = so.mapped_column(sa.String(32), default="open")
-    # Store chat‑style messages as JSON list of strings for simplicity
-    messages: so.Mapped[list[str]] = so.mapped_column(sa.JSON, default=list)
 
     student: so.Mapped["Student"] = so.relationship(backref="tickets_opened")
     counsellor: so.Mapped[Optional["Counsellor"]] = so.relationship(backref="tickets_handled")
+    # a thread can be long: read it a page at a time with app.tickets.ticket_thread rather than loading it all
+    messages: so.Mapped[list["TicketMessage"]] = so.relationship(back_populates="ticket", lazy="write_only",
+                                                                 cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Ticket {self.id} status={self.status}>"
 
 
+# Ticket 1-n TicketMessage; replying is a single-row insert instead of rewriting a JSON list
+class TicketMessage(db.Model):
+    __tablename__ = "ticket_messages"
+    # threads are read in id order, a page at a time
+    __table_args__ = (sa.Index("ix_ticket_messages_ticket_id_id", "ticket_id", "id"),)
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    ticket_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey("tickets.id", ondelete="CASCADE"))
+    sender_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey("users.id", ondelete="SET NULL"))
+    content: so.Mapped[str] = so.mapped_column(sa.Text, nullable=False)
+    created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=sa.func.now())
+
+    ticket: so.Mapped["Ticket"] = so.relationship(back_populates="messages")
+    sender: so.Mapped[Optional["User"]] = so.relationship()
+
+    def __repr__(self) -> str:
+        return f"<TicketMessage {self.id} ticket={self.ticket_id}>"
+
+
+
+user_cache = UserCache(ttl=app.config['USER_CACHE_TTL'])
+
+# drop a cached identity as soon as its email, password, role or anything else is flushed; this only reaches
+# the current worker's cache, the others pick the change up within USER_CACHE_TTL
+@sa.event.listens_for(User, 'after_update', propagate=True)
+@sa.event.listens_for(User, 'after_delete', propagate=True)
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
 
 @login.user_loader
 def load_user(id):
-    return db.session.get(User, int(id))
+    user = user_cache.get(int(id))
+    if user is None:
+        # with_polymorphic joins every subclass table up front, so a miss is a single query
+        user = db.session.scalar(sa.select(so.with_polymorphic(User, '*')).where(User.id == int(id)))
+        if user is not None:
+            user_cache.put(user)
+    return user
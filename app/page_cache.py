@@ -0,0 +1,62 @@
+import threading
+import time
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+from app import app, db
+from app.models import PageCache
+from app.data_version import data_version
+
+
+class VersionedPageCache:
+    """
+    Rendered fragments keyed by page and parameters, valid for one data version. They are stored in
+    the page_cache table, so every worker process shares them.
+
+    A fragment is served while its version is current. After the data changes, it is still served for
+    `stale_seconds` after it was rendered. Under a steady stream of new messages this limits re-renders
+    of a page to about one per window, instead of one per view.
+
+    Each write drops entries of the same data version that can no longer be served, then the oldest
+    beyond `max_entries`, since parameters such as report date ranges give an unbounded set of keys.
+    """
+
+    def __init__(self, stale_seconds=30, max_entries=1000):
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._render_lock = threading.Lock()
+
+    def _fresh(self, entry, version):
+        return entry is not None and (entry.version == version or
+                                      time.time() - entry.rendered_at < self.stale_seconds)
+
+    def get_or_render(self, key, render, version_name):
+        version = data_version(version_name)
+        entry = db.session.get(PageCache, key)
+        if self._fresh(entry, version):
+            return entry.body
+        # one render at a time per process; a request that waited re-checks before rendering again
+        with self._render_lock:
+            entry = db.session.get(PageCache, key, populate_existing=True)
+            if self._fresh(entry, version):
+                return entry.body
+            body = render()
+            now = time.time()
+            stmt = insert(PageCache).values(key=key, version_name=version_name, version=version, rendered_at=now,
+                                            body=body)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['key'],
+                set_={c: stmt.excluded[c] for c in ('version_name', 'version', 'rendered_at', 'body')}))
+            self._prune(version_name, version, now)
+            db.session.commit()
+            return body
+
+    def _prune(self, version_name, version, now):
+        db.session.execute(sa.delete(PageCache).where(
+            PageCache.version_name == version_name, PageCache.version != version,
+            PageCache.rendered_at < now - self.stale_seconds))
+        newest = sa.select(PageCache.key).order_by(PageCache.rendered_at.desc()).offset(self.max_entries)
+        db.session.execute(sa.delete(PageCache).where(PageCache.key.in_(newest)))
+
+
+page_cache = VersionedPageCache(stale_seconds=app.config['PAGE_CACHE_STALE_SECONDS'],
+                                max_entries=app.config['PAGE_CACHE_MAX_ENTRIES'])
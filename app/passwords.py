@@ -0,0 +1,60 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+from app import app
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_in_flight = None
+
+
+def _pool():
+    """ Per-process ProcessPoolExecutor, created on first use (and again after a fork). """
+    global _executor, _executor_pid, _in_flight
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            workers = app.config['PASSWORD_HASH_WORKERS']
+            # spawn rather than fork: the web worker is multi-threaded and the children only need werkzeug
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+            # bound queued work so a login burst waits here instead of piling up inside the executor
+            _in_flight = threading.BoundedSemaphore(workers * 4)
+        return _executor, _in_flight
+
+
+def _run(fn, *args):
+    if not app.config['PASSWORD_HASH_WORKERS']:
+        return fn(*args)
+    executor, in_flight = _pool()
+    with in_flight:
+        return executor.submit(fn, *args).result()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method):
+    # werkzeug expands defaults (e.g. 'scrypt' -> 'scrypt:32768:8:1'), so read the prefix off a real hash
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """ True if the hash was made with a different method or cost than PASSWORD_HASH_METHOD. """
+    return password_hash.split('$', 1)[0] != _hash_prefix(app.config['PASSWORD_HASH_METHOD'])
+
+
+@atexit.register
+def _shutdown_pool():
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=False, cancel_futures=True)
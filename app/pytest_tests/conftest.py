@@ -0,0 +1,38 @@
+import os
+import tempfile
+import pytest
+
+# point the app at a scratch database before it is imported, so no test ever touches app/data/data.sqlite
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='uniss_tests_'), 'test.sqlite')
+
+
+@pytest.fixture
+def database():
+    """ An app context over a freshly created, empty scratch database. """
+    from app import app, db
+    from app.models import user_cache
+    from app.query_sketch import query_sketch
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # ids are reused by the next test's users
+        user_cache.clear()
+        yield db
+        # queries recorded by view tests are written now rather than by the exit hook, after logging has shut down
+        query_sketch.flush()
+        db.session.remove()
+
+
+@pytest.fixture
+def client_as(database, monkeypatch):
+    """ Returns a function giving a test client logged in as a user, with CSRF checks off. """
+    from app import app
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+
+    def login(user):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return login
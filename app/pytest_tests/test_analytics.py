@@ -0,0 +1,64 @@
+from datetime import date
+import numpy as np
+import pytest
+from app.analytics import aggregate_trends, day_number
+
+MON, TUE, NEXT_MON = date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 10)
+
+
+def trends(bucket, start=MON, end=NEXT_MON):
+    days = [day_number(d) for d in (MON, MON, TUE, NEXT_MON)]
+    return aggregate_trends(
+        start, end, bucket,
+        review_days=days, review_features=['Chatbot', 'Chatbot', 'General', 'Chatbot'],
+        review_stars=[5, 3, 4, 1], review_users=[1, 2, 1, -1],
+        message_days=[day_number(MON)] * 3 + [day_number(NEXT_MON)], message_users=[1, 1, -1, 3],
+    )
+
+
+# Positive test case: daily buckets hold per-feature star counts, message volume and distinct users
+def test_daily_buckets():
+    t = trends('day')
+    assert len(t.starts) == 8 and t.starts[0] == MON
+    assert t.features == ['Chatbot', 'General']
+    assert t.star_counts[0, 0].tolist() == [0, 0, 0, 1, 0, 1]
+    assert t.average_stars[0, 0] == pytest.approx(4.0)
+    assert np.isnan(t.average_stars[1, 0])
+    assert t.message_counts.tolist() == [3, 0, 0, 0, 0, 0, 0, 1]
+    # Monday: users 1 and 2 (user 1 both messaged and reviewed); bot messages and deleted users don't count
+    assert t.active_users.tolist() == [2, 1, 0, 0, 0, 0, 0, 1]
+
+# Positive test case: weekly buckets start on Monday and sum their days
+def test_weekly_buckets():
+    t = trends('week', start=TUE)
+    assert t.starts == [MON, NEXT_MON]
+    # Monday's rows fall before the range and are dropped
+    assert t.review_counts.sum(axis=0).tolist() == [1, 1]
+    assert t.message_counts.tolist() == [0, 1]
+    assert t.rows()[1] == {'start': NEXT_MON, 'messages': 1, 'active_users': 1, 'reviews': 1,
+                           'averages': [1.0, None]}
+
+# Negative test case: no rows gives empty-but-well-shaped arrays and an invalid bucket is rejected
+def test_empty_and_invalid():
+    t = aggregate_trends(MON, TUE, 'day', [], [], [], [], [], [])
+    assert t.star_counts.shape == (0, 2, 6)
+    assert t.message_counts.tolist() == [0, 0]
+    assert t.active_users.tolist() == [0, 0]
+    with pytest.raises(ValueError):
+        aggregate_trends(MON, TUE, 'month', [], [], [], [], [], [])
+
+# Positive test case: pre-aggregated rows (as read from app.trend_rollups) give the same trends as raw rows
+def test_weighted_rows_match_raw_rows():
+    mon, tue, next_mon = (day_number(d) for d in (MON, TUE, NEXT_MON))
+    t = aggregate_trends(
+        MON, NEXT_MON, 'day',
+        review_days=[mon, mon, tue, next_mon], review_features=['Chatbot', 'Chatbot', 'General', 'Chatbot'],
+        review_stars=[5, 3, 4, 1], review_users=[-1] * 4, review_weights=[1, 1, 1, 1],
+        # per-day message counts, then user-day rows that only mark users as active
+        message_days=[mon, next_mon, mon, mon, tue, next_mon], message_users=[-1, -1, 1, 2, 1, 3],
+        message_weights=[3, 1, 0, 0, 0, 0],
+    )
+    raw = trends('day')
+    assert np.array_equal(t.star_counts, raw.star_counts)
+    assert np.array_equal(t.message_counts, raw.message_counts)
+    assert np.array_equal(t.active_users, raw.active_users)
@@ -0,0 +1,87 @@
+import threading
+from types import SimpleNamespace
+import sqlalchemy as sa
+import app.chat_context as chat_context
+from app import app as flask_app
+from app.chat_context import build_contents, estimate_tokens, split_turns
+from app.message_log import MessageWriter
+from app.models import Conversation, ConversationSummary, Message, Student
+
+
+def messages(*contents):
+    # newest first, the order build_contents reads them in
+    return [SimpleNamespace(id=len(contents) - i, role='user', content=c) for i, c in enumerate(contents)]
+
+
+# Positive test case: everything fits, so all turns are kept oldest first
+def test_split_turns_within_budget():
+    recent = messages('c' * 40, 'b' * 40, 'a' * 40)
+    turns, older = split_turns(recent, budget=100)
+    assert [m.content[0] for m in turns] == ['a', 'b', 'c']
+    assert older == []
+
+# Positive test case: turns beyond the budget are handed back, oldest first, for summarising
+def test_split_turns_over_budget():
+    recent = messages('c' * 40, 'b' * 40, 'a' * 40)
+    turns, older = split_turns(recent, budget=2 * estimate_tokens('x' * 40))
+    assert [m.content[0] for m in turns] == ['b', 'c']
+    assert [m.content[0] for m in older] == ['a']
+
+# Negative test case: a single message larger than the budget is still sent rather than dropped
+def test_split_turns_oversized_message():
+    recent = messages('z' * 4000, 'y' * 10)
+    turns, older = split_turns(recent, budget=10)
+    assert [m.content[0] for m in turns] == ['z']
+    assert [m.content[0] for m in older] == ['y']
+
+
+def _conversation(database, *contents):
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    database.session.add(student)
+    database.session.flush()
+    conversation = Conversation(user_id=student.id)
+    database.session.add(conversation)
+    database.session.flush()
+    database.session.add_all(Message(conversation_id=conversation.id, role='user', content=c) for c in contents)
+    database.session.commit()
+    return conversation.id
+
+# Positive test case: an exchange still queued by the write-behind writer is part of the next prompt
+def test_build_contents_includes_queued_rows(database):
+    conversation_id = _conversation(database, 'I feel stressed')
+    release = threading.Event()
+    writer = MessageWriter(lambda batch: release.wait(), max_queue=10, batch_size=100, flush_seconds=0.01)
+    writer.enqueue([dict(conversation_id=conversation_id, role='user', content='about exams'),
+                    dict(conversation_id=conversation_id, role='bot', content='Try a study plan.')],
+                   key=conversation_id)
+    contents = build_contents(conversation_id, 'what else?', summarise=None, writer=writer)
+    assert [(c['role'], c['parts'][0]['text']) for c in contents] == [
+        ('user', 'I feel stressed'), ('user', 'about exams'), ('model', 'Try a study plan.'), ('user', 'what else?')]
+    release.set()
+    writer.close()
+
+# Negative test case: more unsummarised messages than one scan holds are all folded, oldest first, off the request
+def test_fold_covers_messages_beyond_scan_limit(database, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'CHAT_CONTEXT_SCAN_LIMIT', 5)
+    monkeypatch.setitem(flask_app.config, 'CHAT_CONTEXT_TOKEN_BUDGET', 2 * estimate_tokens('x' * 40))
+    background = []
+    monkeypatch.setattr(chat_context, 'run_in_background', lambda fn, *args: background.append((fn, args)))
+    conversation_id = _conversation(database, *[f'{i:02d}' + 'x' * 38 for i in range(12)])
+
+    calls = []
+    def summarise(previous, messages):
+        calls.append([m.content[:2] for m in messages])
+        return f'{previous or ""}+{len(messages)}'
+
+    contents = build_contents(conversation_id, 'next', summarise)
+    # the reply didn't wait for the fold: it only carries the newest turn for now
+    assert calls == [] and len(background) == 1
+    assert [c['parts'][0]['text'][:2] for c in contents] == ['11', 'ne']
+
+    fn, args = background[0]
+    fn(*args)
+    assert calls == [['00', '01', '02', '03', '04'], ['05', '06', '07', '08', '09'], ['10']]
+    record = database.session.get(ConversationSummary, conversation_id)
+    assert record.summary == '+5+5+1'
+    assert record.last_message_id == database.session.scalar(
+        sa.select(Message.id).where(Message.content.startswith('10')))
@@ -1,11 +1,25 @@
+import json
 import pytest
-from app.chatbot import get_bot_response, FAQ_RESPONSES, client
+import sqlalchemy as sa
+from flask import session
+from app import app, db
+from app.models import Message, Student
+from app.chatbot import get_bot_response, stream_bot_response, current_conversation_id, FAQ_RESPONSES, client, \
+    response_cache
 
 class DummyResponse:
     def __init__(self, text):
         self.text = text
 
 
+# Start every test with an empty reply cache so stubbed Gemini replies don't leak between tests
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
 # Positive test case
 def test_get_bot_response_known_faq():
     user_input = "how can i clear all conversation history?"
@@ -32,4 +46,75 @@ def test_get_bot_response_external_api_error(monkeypatch):
     monkeypatch.setattr(client.models, "generate_content", dummy_generate_content_error)
     with pytest.raises(RuntimeError) as excinfo:
         get_bot_response(user_input)
-    assert "API failure" in str(excinfo.value)
\ No newline at end of file
+    assert "API failure" in str(excinfo.value)
+
+# Positive test case: a repeated question is answered from the cache without calling Gemini again
+def test_get_bot_response_cached(monkeypatch):
+    calls = []
+    def dummy_generate_content(model, contents):
+        calls.append(contents)
+        return DummyResponse("Try a short walk.")
+    monkeypatch.setattr(client.models, "generate_content", dummy_generate_content)
+    assert get_bot_response("How do I relax?") == "Try a short walk."
+    assert get_bot_response("how do i relax") == "Try a short walk."
+    assert len(calls) == 1
+    assert response_cache.stats()['hits'] == 1
+
+# Positive test case: the streaming path yields Gemini's chunks in order and caches the joined reply
+def test_stream_bot_response(monkeypatch):
+    def dummy_generate_content_stream(model, contents):
+        return iter([DummyResponse("Deep "), DummyResponse("breaths "), DummyResponse("help.")])
+    monkeypatch.setattr(client.models, "generate_content_stream", dummy_generate_content_stream)
+    assert list(stream_bot_response("How can I calm down?")) == ["Deep ", "breaths ", "help."]
+    assert response_cache.get("gemini-2.0-flash", "how can i calm down") == "Deep breaths help."
+
+# Positive test case: an existing conversation in the session is reused without another insert
+def test_current_conversation_id_reuses_session():
+    with app.test_request_context('/get', method='POST'):
+        session["conversation_id"] = 42
+        assert current_conversation_id() == 42
+
+# Negative test case: no conversation is created for an anonymous visitor
+def test_current_conversation_id_anonymous():
+    with app.test_request_context('/get', method='POST'):
+        assert current_conversation_id() is None
+        assert "conversation_id" not in session
+
+def _sse_events(body):
+    """ Split a text/event-stream body into (event, data) pairs. """
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+# Positive test case: /get/stream sends one data event per chunk, then done, and logs the whole exchange
+def test_stream_view_frames_and_logs_reply(client_as, monkeypatch):
+    student = Student(username="s", email="s@uniss.com", role="Student")
+    db.session.add(student)
+    db.session.commit()
+    monkeypatch.setattr(client.models, "generate_content_stream",
+                        lambda model, contents: iter([DummyResponse("Deep "), DummyResponse("breaths.")]))
+
+    response = client_as(student).post("/get/stream", data={"msg": "How can I calm down?"})
+    assert response.mimetype == "text/event-stream"
+    assert _sse_events(response.get_data(as_text=True)) == [
+        ("message", {"delta": "Deep "}), ("message", {"delta": "breaths."}), ("done", {})]
+
+    logged = db.session.execute(sa.select(Message.role, Message.content, Message.sender_id)
+                                .order_by(Message.id)).all()
+    assert logged == [("user", "How can I calm down?", student.id), ("bot", "Deep breaths.", None)]
+
+# Negative test case: a Gemini failure mid-stream ends with an error event and nothing is logged
+def test_stream_view_error_event(client_as, monkeypatch):
+    student = Student(username="s", email="s@uniss.com", role="Student")
+    db.session.add(student)
+    db.session.commit()
+    def failing_stream(model, contents):
+        yield DummyResponse("Deep ")
+        raise RuntimeError("API failure")
+    monkeypatch.setattr(client.models, "generate_content_stream", failing_stream)
+
+    response = client_as(student).post("/get/stream", data={"msg": "How can I calm down?"})
+    assert _sse_events(response.get_data(as_text=True)) == [("message", {"delta": "Deep "}), ("error", {})]
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(Message)) == 0
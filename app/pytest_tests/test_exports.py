@@ -0,0 +1,34 @@
+import csv
+import io
+from datetime import date
+from app.exports import csv_chunks, export_query
+
+# Positive test case: rows are flushed in several chunks that join back into one valid CSV
+def test_csv_chunks_streams_all_rows():
+    rows = [(n, f'message, "{n}"\nsecond line') for n in range(500)]
+    chunks = list(csv_chunks(['id', 'content'], iter(rows), chunk_bytes=1024))
+    assert len(chunks) > 1
+    parsed = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert parsed[0] == ['id', 'content']
+    assert parsed[1:] == [[str(n), text] for n, text in rows]
+
+# Negative test case: with no rows only the header is written
+def test_csv_chunks_empty_export():
+    assert ''.join(csv_chunks(['id'], iter([]))) == 'id\r\n'
+
+# Positive test case: a date range filters on created_at, inclusive of the end day, and orders by it
+def test_export_query_date_range():
+    header, q = export_query('reviews', start=date(2025, 1, 1), end=date(2025, 1, 31), feature='Chatbot')
+    sql = str(q.compile(compile_kwargs={'literal_binds': True}))
+    assert header[:2] == ['id', 'created_at']
+    assert "reviews.created_at >= '2025-01-01 00:00:00'" in sql
+    assert "reviews.created_at < '2025-02-01 00:00:00'" in sql
+    assert "reviews.feature = 'Chatbot'" in sql
+    assert sql.rstrip().endswith('ORDER BY reviews.created_at')
+
+# Negative test case: without dates the export is read in id order and unfiltered
+def test_export_query_whole_table():
+    _, q = export_query('messages')
+    sql = str(q.compile())
+    assert 'WHERE' not in sql
+    assert sql.rstrip().endswith('ORDER BY messages.id')
@@ -0,0 +1,56 @@
+import sqlalchemy as sa
+import app.history as history
+from app.history import delete_history_chunked, history_cutoff
+from app.models import Conversation, Message, Student
+
+
+def _conversation(db, user, *contents):
+    conversation = Conversation(user_id=user.id)
+    db.session.add(conversation)
+    db.session.flush()
+    db.session.add_all(Message(conversation_id=conversation.id, sender_id=user.id, role='user', content=content)
+                       for content in contents)
+    db.session.commit()
+    return conversation.id
+
+
+# Positive test case: the chunked delete removes everything the user had when they asked
+def test_chunked_delete_removes_history(database):
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    other = Student(username='o', email='o@uniss.com', role='Student')
+    database.session.add_all([student, other])
+    database.session.commit()
+    for i in range(3):
+        _conversation(database, student, f'old {i}', f'older {i}')
+    kept = _conversation(database, other, 'not mine')
+
+    delete_history_chunked(student.id, history_cutoff(), chunk_size=2)
+    assert database.session.scalars(sa.select(Conversation.id)).all() == [kept]
+    assert database.session.scalars(sa.select(Message.content)).all() == ['not mine']
+
+
+# Negative test case: conversations and messages written while the delete runs survive it
+def test_chunked_delete_keeps_new_activity(database, monkeypatch):
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    database.session.add(student)
+    database.session.commit()
+    first = _conversation(database, student, 'old 0')
+    for i in range(1, 3):
+        _conversation(database, student, f'old {i}')
+    cutoff = history_cutoff()
+
+    # after the first chunk, the user starts a new chat and a late message lands in an old one
+    written = []
+    bump = history.bump_data_version
+    def bump_and_write(connection):
+        bump(connection)
+        if not written:
+            written.append(_conversation(database, student, 'new chat'))
+            database.session.add(Message(conversation_id=first + 2, sender_id=student.id, role='user',
+                                         content='late reply'))
+    monkeypatch.setattr(history, 'bump_data_version', bump_and_write)
+
+    delete_history_chunked(student.id, cutoff, chunk_size=1)
+    assert sorted(database.session.scalars(sa.select(Message.content)).all()) == ['late reply', 'new chat']
+    assert database.session.scalars(sa.select(Conversation.id).order_by(Conversation.id)).all() == \
+        [first + 2, written[0]]
@@ -0,0 +1,25 @@
+from datetime import datetime
+from app import app
+from app.http_cache import page_etag, not_modified
+
+UPDATED = datetime(2025, 1, 1, 12, 0, 0)
+
+
+# Positive test case: a matching If-None-Match is answered with an empty 304 carrying the cache policy
+def test_not_modified_matching_etag():
+    with app.test_request_context('/student/resources', headers={'If-None-Match': '"anon-resources-1"'}):
+        assert page_etag('resources', 1) == 'anon-resources-1'
+        response = not_modified('anon-resources-1', UPDATED)
+        assert response.status_code == 304
+        assert response.cache_control.private
+        assert 'Cookie' in response.vary
+
+# Positive test case: If-Modified-Since at or after last_updated also counts as fresh
+def test_not_modified_since():
+    with app.test_request_context('/student/resources', headers={'If-Modified-Since': 'Wed, 01 Jan 2025 12:00:00 GMT'}):
+        assert not_modified('anon-resources-1', UPDATED).status_code == 304
+
+# Negative test case: a stale ETag means the page is rendered as usual
+def test_not_modified_stale_etag():
+    with app.test_request_context('/student/resources', headers={'If-None-Match': '"anon-resources-0"'}):
+        assert not_modified('anon-resources-1', UPDATED) is None
@@ -0,0 +1,55 @@
+import pytest
+from app import app as flask_app
+from app.chatbot import FAQ_RESPONSES as SHIPPED_FAQS
+from app.intent_router import IntentRouter, KeywordAutomaton
+
+FAQS = {
+    "how can i clear all conversation history?": "history answer",
+    "can i make an appointment for counselling?": "appointment answer",
+}
+KEYWORDS = [("faq", "faq"), ("resource", "resources"), ("support", "support"), ("review", "review")]
+
+
+# Positive test case: overlapping keywords are all found and the earliest-listed one wins
+def test_keyword_automaton_priority():
+    automaton = KeywordAutomaton([("he", "A"), ("she", "B"), ("his", "C"), ("hers", "D")])
+    assert automaton.match("ushers") == "A"
+    assert automaton.match("ahisx") == "C"
+    assert automaton.match("xyz") is None
+
+# Positive test case: exact and near-miss FAQ phrasings are answered locally
+def test_router_faq_exact_and_near_miss():
+    router = IntentRouter(FAQS, KEYWORDS)
+    assert router.route("How can I clear all conversation history").key == "how can i clear all conversation history?"
+    near = router.route("can i book an appointment for counseling")
+    assert near.kind == "faq"
+    assert near.key == "can i make an appointment for counselling?"
+
+# Positive test case: keyword order matches the old elif chain
+def test_router_keyword_priority():
+    router = IntentRouter(FAQS, KEYWORDS)
+    assert router.route("I need support with a review") == ("keyword", "support", 1.0)
+    assert router.route("Where are the FAQs?").key == "faq"
+
+# Negative test case: unrelated messages are left for the LLM
+def test_router_no_match():
+    router = IntentRouter(FAQS, KEYWORDS)
+    assert router.route("Tell me a joke") is None
+    assert router.route("how can i clear") is None
+
+# Negative test case: negated or extended questions go to the LLM rather than a canned FAQ answer
+@pytest.mark.parametrize("message", [
+    "I cannot make an appointment for counselling",
+    "I can't make an appointment for counselling?",
+    "can i make an appointment for counselling next week with a woman",
+    "can i speak to a human agent about self harm",
+])
+def test_router_near_miss_needs_llm(message):
+    router = IntentRouter(SHIPPED_FAQS, KEYWORDS, threshold=flask_app.config['CHATBOT_FAQ_THRESHOLD'])
+    assert router.route(message) is None
+
+# Positive test case: rephrasings that add nothing are still answered locally with the shipped threshold
+def test_router_shipped_near_misses():
+    router = IntentRouter(SHIPPED_FAQS, KEYWORDS, threshold=flask_app.config['CHATBOT_FAQ_THRESHOLD'])
+    assert router.route("can i make appointment for counselling").key == "can i make an appointment for counselling?"
+    assert router.route("how do i clear my conversation history").key == "how can i clear all conversation history?"
@@ -0,0 +1,123 @@
+import threading
+from app.message_log import MessageWriter
+
+
+# Positive test case: queued exchanges are written in bulk by the background thread
+def test_writer_batches_rows():
+    batches = []
+    writer = MessageWriter(batches.append, max_queue=10, batch_size=4, flush_seconds=0.05)
+    for i in range(3):
+        assert writer.enqueue([{'content': f'user {i}'}, {'content': f'bot {i}'}])
+    writer.flush()
+    writer.close()
+    written = [row['content'] for batch in batches for row in batch]
+    assert written == ['user 0', 'bot 0', 'user 1', 'bot 1', 'user 2', 'bot 2']
+    assert all(len(batch) <= 4 for batch in batches)
+
+# Negative test case: a full queue reports backpressure instead of blocking forever
+def test_writer_backpressure_when_full():
+    release = threading.Event()
+    writer = MessageWriter(lambda batch: release.wait(), max_queue=1, batch_size=1,
+                           flush_seconds=0.01, enqueue_timeout=0.01)
+    assert writer.enqueue([{'content': 'a'}])
+    # wait until the flusher is blocked inside write_batch, then fill the single queue slot
+    while not writer._queue.empty():
+        pass
+    assert writer.enqueue([{'content': 'b'}])
+    assert writer.enqueue([{'content': 'c'}]) is False
+    release.set()
+    writer.close()
+
+# Positive test case: close() drains rows that are still queued
+def test_writer_flushes_on_close():
+    batches = []
+    writer = MessageWriter(batches.append, max_queue=10, batch_size=100, flush_seconds=0.05)
+    writer.enqueue([{'content': 'last words'}])
+    writer.close()
+    assert [row['content'] for batch in batches for row in batch] == ['last words']
+
+# Positive test case: a transient failure such as "database is locked" is retried, not dropped
+def test_writer_retries_failed_batch():
+    batches, failures = [], [2]
+    def flaky_write(batch):
+        if failures[0]:
+            failures[0] -= 1
+            raise RuntimeError('database is locked')
+        batches.append(batch)
+    writer = MessageWriter(flaky_write, max_queue=10, batch_size=100, flush_seconds=0.01, retry_backoff=0.001)
+    writer.enqueue([{'content': 'user'}, {'content': 'bot'}])
+    writer.close()
+    assert batches == [[{'content': 'user'}, {'content': 'bot'}]]
+
+# Negative test case: when a batch keeps failing, only the exchange that can't be written is dropped
+def test_writer_isolates_bad_exchange():
+    written = []
+    def write(batch):
+        if any(row['content'] == 'bad' for row in batch):
+            raise ValueError('bad row')
+        written.extend(row['content'] for row in batch)
+    writer = MessageWriter(write, max_queue=10, batch_size=100, flush_seconds=0.05, retries=1, retry_backoff=0.001)
+    for content in ['a', 'bad', 'b']:
+        writer.enqueue([{'content': content}])
+    writer.close()
+    assert written == ['a', 'b']
+
+# Positive test case: queued rows are tracked per key until their batch commits
+def test_writer_tracks_pending_rows_by_key():
+    release, written = threading.Event(), []
+    def write(batch):
+        release.wait()
+        written.extend(batch)
+    writer = MessageWriter(write, max_queue=10, batch_size=100, flush_seconds=0.01)
+    writer.enqueue([{'content': 'a1'}, {'content': 'a2'}], key=1)
+    writer.enqueue([{'content': 'b1'}], key=2)
+    assert writer.pending(1)[0] == [{'content': 'a1'}, {'content': 'a2'}]
+    assert writer.pending(2)[0] == [{'content': 'b1'}]
+    assert writer.pending(3)[0] == []
+    release.set()
+    writer.flush()
+    # once committed the rows are in the table, so they are no longer reported as pending
+    assert writer.pending(1)[0] == [] and writer.pending(2)[0] == []
+    writer.close()
+    assert len(written) == 3
+
+# Negative test case: a failing batch keeps its rows pending while it is retried
+def test_writer_keeps_pending_rows_while_retrying():
+    failing, attempts, written = threading.Event(), [], []
+    failing.set()
+    def write(batch):
+        attempts.append(len(batch))
+        if failing.is_set():
+            raise RuntimeError('database is locked')
+        written.extend(batch)
+    writer = MessageWriter(write, max_queue=10, batch_size=100, flush_seconds=0.01, retries=50, retry_backoff=0.01)
+    writer.enqueue([{'content': 'a'}], key=1)
+    while len(attempts) < 2:
+        pass
+    assert writer.pending(1)[0] == [{'content': 'a'}]
+    failing.clear()
+    writer.close()
+    assert written == [{'content': 'a'}]
+    assert writer.pending(1)[0] == []
+
+# Negative test case: a read that overlaps a commit is repeated, so no row is returned twice
+def test_read_with_pending_repeats_read_across_commit():
+    table, release = [], threading.Event()
+    def write(batch):
+        release.wait()
+        table.extend(batch)
+    writer = MessageWriter(write, max_queue=10, batch_size=100, flush_seconds=0.01)
+    writer.enqueue([{'content': 'a'}], key=1)
+    reads = []
+    def read():
+        reads.append(list(table))
+        if len(reads) == 1:
+            # the batch commits while the first read is running
+            release.set()
+            while writer.pending(1)[0]:
+                pass
+        return list(table)
+    result, queued = writer.read_with_pending(1, read)
+    assert len(reads) == 2
+    assert result + queued == [{'content': 'a'}]
+    writer.close()
@@ -0,0 +1,19 @@
+from app.metrics import Histogram
+
+
+# Positive test case: buckets are cumulative and rendered in Prometheus text format
+def test_histogram_render():
+    histogram = Histogram('demo_seconds', 'Demo.', (0.1, 1.0), 'endpoint')
+    histogram.observe('home', 0.05)
+    histogram.observe('home', 0.5)
+    histogram.observe('home', 5.0)
+    lines = histogram.render()
+    assert '# TYPE demo_seconds histogram' in lines
+    assert 'demo_seconds_bucket{endpoint="home",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{endpoint="home",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{endpoint="home",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{endpoint="home"} 3' in lines
+
+# Negative test case: nothing observed means only the header lines
+def test_histogram_empty():
+    assert len(Histogram('demo_seconds', 'Demo.', (0.1,), 'endpoint').render()) == 2
@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+import sqlalchemy as sa
+from app.data_version import TRENDS, bump_data_version
+from app.models import PageCache
+from app.page_cache import VersionedPageCache
+
+
+def _keys(db):
+    return set(db.session.scalars(sa.select(PageCache.key)))
+
+
+# Positive test case: an entry rendered for the current data version is served
+def test_fresh_current_version():
+    cache = VersionedPageCache(stale_seconds=0)
+    assert cache._fresh(SimpleNamespace(version=3, rendered_at=0.0), version=3)
+
+# Positive test case: after a change, an entry is still served inside the staleness window
+def test_fresh_within_stale_window():
+    cache = VersionedPageCache(stale_seconds=30)
+    assert cache._fresh(SimpleNamespace(version=3, rendered_at=time.time() - 5), version=4)
+
+# Negative test case: an outdated entry past the window, or no entry at all, must be re-rendered
+def test_stale_or_missing():
+    cache = VersionedPageCache(stale_seconds=30)
+    assert not cache._fresh(SimpleNamespace(version=3, rendered_at=time.time() - 60), version=4)
+    assert not cache._fresh(None, version=0)
+
+# Positive test case: a write drops entries superseded by a data change once their stale window has passed
+def test_write_drops_superseded_entries(database, monkeypatch):
+    cache = VersionedPageCache(stale_seconds=30)
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    cache.get_or_render('old', lambda: 'old body', TRENDS)
+    cache.get_or_render('other', lambda: 'other body', 'other')
+    with database.engine.begin() as conn:
+        bump_data_version(conn)
+        bump_data_version(conn, 'other')
+
+    cache.get_or_render('recent', lambda: 'recent body', TRENDS)
+    # still inside the window, so the outdated entry may be served and is kept
+    assert _keys(database) == {'old', 'other', 'recent'}
+    clock[0] += 60
+    cache.get_or_render('new', lambda: 'new body', TRENDS)
+    # only entries of the data version that was written are checked
+    assert _keys(database) == {'other', 'recent', 'new'}
+
+# Negative test case: however many distinct keys are rendered, the table keeps only the newest max_entries
+def test_write_caps_entries(database, monkeypatch):
+    cache = VersionedPageCache(stale_seconds=30, max_entries=3)
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    for i in range(5):
+        clock[0] += 1
+        cache.get_or_render(f'page:{i}', lambda: 'body', TRENDS)
+    assert _keys(database) == {'page:2', 'page:3', 'page:4'}
@@ -0,0 +1,56 @@
+import sqlalchemy as sa
+from app.models import QueryCount
+from app.query_sketch import SharedQuerySketch, SpaceSaving, normalise_query
+
+
+# Positive test case
+def test_normalise_query_merges_trivial_variants():
+    assert normalise_query("  How do I book   counselling?? ") == "how do i book counselling"
+    assert normalise_query("How do I book counselling") == normalise_query("how do i BOOK counselling!")
+
+# Positive test case
+def test_space_saving_counts_exactly_below_capacity():
+    sketch = SpaceSaving(capacity=3)
+    for query in ['a', 'b', 'a', 'c', 'a', 'b']:
+        sketch.add(query)
+    assert sketch.most_common(2) == [('a', 3), ('b', 2)]
+
+# Positive test case: heavy hitters survive a stream of one-off queries in fixed memory
+def test_space_saving_keeps_heavy_hitters_when_full():
+    sketch = SpaceSaving(capacity=5)
+    for i in range(1000):
+        sketch.add('frequent')
+        sketch.add(f'rare-{i}')
+    assert len(sketch) == 5
+    assert sketch.most_common(1)[0][0] == 'frequent'
+    assert sketch.most_common(1)[0][1] >= 1000
+
+# Negative test case: draining empties the summary
+def test_space_saving_drain_resets():
+    sketch = SpaceSaving(capacity=2)
+    sketch.add('a')
+    assert sketch.drain() == [('a', 1, 0)]
+    assert len(sketch) == 0
+    assert sketch.most_common(5) == []
+
+# Positive test case: when full, the least-counted query is the one replaced
+def test_space_saving_evicts_smallest_counter():
+    sketch = SpaceSaving(capacity=2)
+    for query in ['a', 'a', 'a', 'b', 'c']:
+        sketch.add(query)
+    assert sketch.counts == {'a': 3, 'c': 2}
+    assert sketch.errors == {'a': 0, 'c': 1}
+    sketch.add('c', count=5)
+    sketch.add('d')
+    assert sketch.counts == {'c': 7, 'd': 4}
+
+# Negative test case: reading the top queries merges unflushed counts without writing them
+def test_shared_sketch_reads_do_not_flush(database):
+    sketch = SharedQuerySketch(capacity=10, flush_seconds=3600, flush_size=100)
+    sketch.record('Book counselling')
+    sketch.record('book counselling!')
+    assert sketch.most_common(5) == [('book counselling', 2)]
+    assert database.session.scalar(sa.select(sa.func.count()).select_from(QueryCount)) == 0
+    sketch.flush()
+    sketch.record('exam stress')
+    assert sketch.most_common(5) == [('book counselling', 2), ('exam stress', 1)]
@@ -0,0 +1,92 @@
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from app import app as flask_app
+from app.entities import Report
+from app.models import Review, Student
+from app.report_jobs import request_report, render_report_job
+from app.views import report_job_status
+
+# Positive test case
+def test_generate_writes_report_to_requested_path(tmp_path):
+    path = tmp_path / "report.pdf"
+    student = SimpleNamespace(id=7, username="student_demo")
+
+    assert Report.generate(student, "Reviews: 3", path=str(path)) == "Reviews: 3"
+
+    # the whole report lands at the final name and the temporary file is renamed away
+    content = path.read_text(encoding="utf-8")
+    assert content.startswith("Report for student_demo generated on ")
+    assert content.endswith("Reviews: 3")
+    assert not (tmp_path / "report.pdf.part").exists()
+
+
+# Positive test case
+def test_finished_job_links_to_download():
+    with flask_app.test_request_context():
+        status = report_job_status(SimpleNamespace(id=3, status="done"))
+    assert status["status_url"] == "/student/report/3"
+    assert status["download_url"] == "/student/report/3/download"
+
+
+# Negative test case
+def test_failed_or_pending_job_has_no_download():
+    with flask_app.test_request_context():
+        failed = report_job_status(SimpleNamespace(id=4, status="failed"))
+        queued = report_job_status(SimpleNamespace(id=5, status="queued"))
+    assert "download_url" not in failed and failed["error"]
+    assert "download_url" not in queued and "error" not in queued
+
+
+def _request_and_capture(monkeypatch, tmp_path):
+    import app.report_jobs as report_jobs
+    monkeypatch.setitem(flask_app.config, 'REPORT_DIR', str(tmp_path))
+    dispatched = []
+    monkeypatch.setattr(report_jobs, '_dispatch', dispatched.append)
+    return dispatched
+
+
+# Positive test case: a request is rendered to a file once, and repeat requests that day share the finished job
+def test_request_report_renders_once(database, monkeypatch, tmp_path):
+    dispatched = _request_and_capture(monkeypatch, tmp_path)
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    database.session.add(student)
+    database.session.commit()
+
+    job = request_report(student)
+    assert job.status == 'queued' and dispatched == [job.id]
+    assert request_report(student).id == job.id and dispatched == [job.id]
+
+    render_report_job(job.id)
+    database.session.refresh(job)
+    assert job.status == 'done' and os.path.exists(job.path)
+    # new activity does not start another render the same day
+    database.session.add(Review(user_id=student.id, stars=5, text='great'))
+    database.session.commit()
+    again = request_report(student)
+    assert again.id == job.id and again.status == 'done' and dispatched == [job.id]
+    # a second render of the same job finds it already claimed
+    render_report_job(job.id)
+    database.session.refresh(job)
+    assert job.status == 'done'
+
+
+# Negative test case: a job left running by a dead worker is handed out again after REPORT_JOB_TIMEOUT
+def test_request_report_reclaims_abandoned_job(database, monkeypatch, tmp_path):
+    dispatched = _request_and_capture(monkeypatch, tmp_path)
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    database.session.add(student)
+    database.session.commit()
+    job = request_report(student)
+    job.status = 'running'
+    database.session.commit()
+
+    # still inside the timeout: the running worker is left alone
+    assert request_report(student).status == 'running' and dispatched == [job.id]
+    job.updated_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        seconds=flask_app.config['REPORT_JOB_TIMEOUT'] + 1)
+    database.session.commit()
+    assert request_report(student).status == 'queued' and dispatched == [job.id, job.id]
+    render_report_job(job.id)
+    database.session.refresh(job)
+    assert job.status == 'done' and os.path.exists(job.path)
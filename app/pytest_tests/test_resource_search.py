@@ -0,0 +1,66 @@
+import sqlalchemy as sa
+from app.models import Resource
+from app.resource_search import fts_query, _highlight, search_resources, install_resource_search, HIGHLIGHT_START, \
+    HIGHLIGHT_END
+
+
+def _titles(text, **kwargs):
+    results, _ = search_resources(text, **kwargs)
+    return [result.title for result in results]
+
+
+# Positive test case: words are quoted so FTS5 operators in user input are matched literally
+def test_fts_query_quotes_words():
+    assert fts_query('Exam stress NEAR sleep') == '"exam" "stress" "near" "sleep"*'
+
+# Negative test case: punctuation-only input gives no query instead of an FTS5 syntax error
+def test_fts_query_empty():
+    assert fts_query('  "*()- ') is None
+
+# Positive test case: snippet text is escaped and only the highlight markers become HTML
+def test_highlight_escapes_snippet():
+    snippet = f'<b>tips</b> for {HIGHLIGHT_START}stress{HIGHLIGHT_END}'
+    assert str(_highlight(snippet)) == '&lt;b&gt;tips&lt;/b&gt; for <mark>stress</mark>'
+
+# Positive test case: inserted resources are searchable at once, title matches first, prefix on the last word
+def test_search_finds_inserted_resources(database):
+    database.session.add_all([
+        Resource(title='Sleep hygiene', description='Tips for coping with exam stress at night'),
+        Resource(title='Exam stress', description='Planning revision around deadlines'),
+        Resource(title='Sports clubs', description='Meet people outside your course'),
+    ])
+    database.session.commit()
+
+    assert _titles('exam stre') == ['Exam stress', 'Sleep hygiene']
+    results, has_next = search_resources('exam', per_page=1)
+    assert len(results) == 1 and has_next
+    assert '<mark>night</mark>' in str(search_resources('night')[0][0].snippet)
+
+# Negative test case: the triggers drop old text on update and the whole row on delete, including raw SQL writes
+def test_search_follows_updates_and_deletes(database):
+    resource = Resource(title='Exam stress', description='Planning revision')
+    database.session.add(resource)
+    database.session.commit()
+
+    resource.title = 'Money advice'
+    database.session.commit()
+    assert _titles('exam') == [] and _titles('money') == ['Money advice']
+
+    database.session.execute(sa.text("UPDATE resources SET description = 'Budgeting help' WHERE id = :id"),
+                             {'id': resource.id})
+    assert _titles('revision') == [] and _titles('budgeting') == ['Money advice']
+
+    database.session.delete(resource)
+    database.session.commit()
+    assert _titles('money') == [] and _titles('budgeting') == []
+
+# Positive test case: installing search on an existing database indexes the resources it already holds
+def test_install_indexes_existing_resources(database):
+    database.session.add(Resource(title='Exam stress', description='Planning revision'))
+    database.session.commit()
+    database.session.execute(sa.text("INSERT INTO resources_fts(resources_fts) VALUES ('delete-all')"))
+    database.session.commit()
+    assert _titles('exam') == []
+
+    install_resource_search()
+    assert _titles('exam') == ['Exam stress']
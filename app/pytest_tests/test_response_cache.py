@@ -0,0 +1,56 @@
+import sqlite3
+import pytest
+from app.response_cache import ResponseCache
+
+
+# Positive test case: least recently used entry is evicted first
+def test_lru_eviction():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("m", "a", "A")
+    cache.set("m", "b", "B")
+    assert cache.get("m", "a") == "A"
+    cache.set("m", "c", "C")
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == "A"
+    assert cache.get("m", "c") == "C"
+
+# Negative test case: expired entries are misses
+def test_ttl_expiry(monkeypatch):
+    cache = ResponseCache(maxsize=2, ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("app.response_cache.time.time", lambda: now[0])
+    cache.set("m", "a", "A")
+    now[0] += 11
+    assert cache.get("m", "a") is None
+    assert cache.stats()['misses'] == 1
+
+# Negative test case: the model name is part of the key
+def test_key_includes_model():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("model-a", "hello", "A")
+    assert cache.get("model-b", "hello") is None
+
+# Positive test case: the SQLite tier survives a new cache instance (i.e. a restart)
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    ResponseCache(maxsize=2, ttl=60, path=path).set("m", "Hello?", "Hi")
+    restarted = ResponseCache(maxsize=2, ttl=60, path=path)
+    assert restarted.get("m", "hello") == "Hi"
+    assert restarted.stats()['disk_hits'] == 1
+    assert restarted.get("m", "hello") == "Hi"
+    assert restarted.stats()['hits'] == 1
+
+# Negative test case: the SQLite tier drops expired replies and keeps only the newest disk_maxsize
+def test_disk_tier_is_bounded(tmp_path, monkeypatch):
+    path = str(tmp_path / "responses.sqlite")
+    now = [1000.0]
+    monkeypatch.setattr("app.response_cache.time.time", lambda: now[0])
+    cache = ResponseCache(maxsize=1, ttl=10, path=path, disk_maxsize=2)
+    cache.set("m", "old", "O")
+    now[0] += 11
+    for prompt in ["a", "b", "c"]:
+        cache.set("m", prompt, prompt.upper())
+        now[0] += 1
+    with sqlite3.connect(path) as conn:
+        prompts = {prompt for prompt, in conn.execute("SELECT prompt FROM responses")}
+    assert prompts == {"b", "c"}
@@ -1,5 +1,8 @@
 import pytest
-from app import app as flask_app
+import sqlalchemy as sa
+from app import app as flask_app, db
+from app.models import Admin, Review
+from app.views import UNSPECIFIED_FEATURE
 from app.forms import ReviewForm
 
 # Disable CSRF protection for testing and set valid choices for the 'feature' field
@@ -20,3 +23,31 @@ def test_review_form_invalid():
         assert form.validate() is False
         assert "feature" in form.errors
         assert "stars" in form.errors
+
+
+def _admin_with_reviews(database):
+    admin = Admin(username="admin", email="admin@uniss.com", role="Admin")
+    database.session.add(admin)
+    database.session.add_all([Review(feature="Chatbot", stars=4, text="useful"),
+                              Review(feature="", stars=2, text="no feature"),
+                              Review(feature=None, stars=3, text="legacy")])
+    database.session.commit()
+    return admin
+
+# Positive test case: "Unspecified" selects reviews stored without a feature, and no value means all of them
+def test_manage_reviews_unspecified_feature(client_as):
+    client = client_as(_admin_with_reviews(db))
+    unspecified = client.get(f"/manage_reviews?feature={UNSPECIFIED_FEATURE}").get_data(as_text=True)
+    assert "no feature" in unspecified and "legacy" in unspecified and "useful" not in unspecified
+    everything = client.get("/manage_reviews?feature=").get_data(as_text=True)
+    assert all(text in everything for text in ["useful", "no feature", "legacy"])
+
+# Negative test case: deleting a review keeps the admin's filters and page instead of resetting them
+def test_delete_review_keeps_filters(client_as):
+    client = client_as(_admin_with_reviews(db))
+    review_id = db.session.scalar(sa.select(Review.id).where(Review.text == "no feature"))
+    response = client.post("/delete_review", data={"choice": review_id, "feature": UNSPECIFIED_FEATURE,
+                                                   "stars": "2", "after": "1"})
+    assert response.status_code == 302
+    assert response.headers["Location"] == f"/manage_reviews?feature={UNSPECIFIED_FEATURE}&stars=2&after=1"
+    assert db.session.get(Review, review_id) is None
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from app import app, db
+import app.scheduling as scheduling
+from app.models import Counsellor, CounsellingSession, Student
+from app.scheduling import SlotIndex, claim_slot, is_slot, slot_starts
+
+# 2025-01-06 is a Monday; the default grid is hourly slots from 9:00, the last one starting at 16:00
+MONDAY = datetime(2025, 1, 6)
+
+
+# Positive test case: slots run through opening hours on weekdays only
+def test_slot_starts_weekdays_within_hours():
+    with app.app_context():
+        starts = list(slot_starts(MONDAY.replace(hour=15, minute=30), datetime(2025, 1, 7, 11)))
+    # the last Monday slot, then the first two on Tuesday
+    assert starts == [datetime(2025, 1, 6, 16), datetime(2025, 1, 7, 9), datetime(2025, 1, 7, 10)]
+
+
+# Negative test case: off-grid, out-of-hours and weekend times can't be booked
+def test_is_slot_rejects_off_grid_times():
+    with app.app_context():
+        assert is_slot(MONDAY.replace(hour=9))
+        assert not is_slot(MONDAY.replace(hour=9, minute=30))
+        assert not is_slot(MONDAY.replace(hour=17))
+        assert not is_slot(MONDAY.replace(hour=8))
+        assert not is_slot(datetime(2025, 1, 11, 10))   # Saturday
+
+
+# Positive test case: the least-booked free counsellor is offered, and a fully booked slot has none
+def test_slot_index_free_counsellor():
+    nine, ten = MONDAY.replace(hour=9), MONDAY.replace(hour=10)
+    with app.app_context():
+        index = SlotIndex([(1, 'c1'), (2, 'c2')], [(1, nine), (1, datetime(2025, 1, 7, 9)), (2, ten)])
+        assert index.free_counsellor(nine) == 2
+        assert index.free_counsellor(ten) == 1
+        assert index.free_counsellor(MONDAY.replace(hour=11)) == 2
+
+
+# Negative test case: a session off the grid blocks both slots it overlaps
+def test_slot_index_straddling_session():
+    with app.app_context():
+        index = SlotIndex([(1, 'c1')], [(1, MONDAY.replace(hour=9, minute=30))])
+        assert index.free_counsellor(MONDAY.replace(hour=9)) is None
+        assert index.free_counsellor(MONDAY.replace(hour=10)) is None
+        assert index.free_counsellor(MONDAY.replace(hour=11)) == 1
+
+
+def _people():
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    other = Student(username='o', email='o@uniss.com', role='Student')
+    counsellor = Counsellor(username='c', email='c@uniss.com', role='Counsellor', specialisation='Stress')
+    other_counsellor = Counsellor(username='d', email='d@uniss.com', role='Counsellor', specialisation='Stress')
+    db.session.add_all([student, other, counsellor, other_counsellor])
+    db.session.commit()
+    return student, other, counsellor, other_counsellor
+
+
+def _next_slot():
+    tomorrow = datetime.now() + timedelta(days=1)
+    return next(slot_starts(tomorrow, tomorrow + timedelta(days=7)))
+
+
+def _scheduled():
+    return db.session.scalar(sa.select(sa.func.count()).select_from(CounsellingSession)
+                             .where(CounsellingSession.status == 'scheduled'))
+
+
+# Positive test case: a free slot is booked once
+def test_claim_slot_books_free_slot(database):
+    student, _, counsellor, _ = _people()
+    session = claim_slot(student, counsellor.id, _next_slot())
+    assert session is not None and session.status == 'scheduled' and _scheduled() == 1
+
+
+# Negative test case: a claim racing one that committed first loses on the unique indexes, for the same
+# counsellor and for the same student, even though its clash check saw nothing
+def test_claim_slot_loses_race_on_unique_index(database, monkeypatch):
+    student, other, counsellor, other_counsellor = _people()
+    start = _next_slot()
+    assert claim_slot(student, counsellor.id, start) is not None
+    # as if the clash checks ran before that booking committed
+    monkeypatch.setattr(scheduling, '_scheduled_between', lambda start, end: sa.false())
+
+    assert claim_slot(other, counsellor.id, start) is None
+    assert claim_slot(student, other_counsellor.id, start) is None
+    assert _scheduled() == 1
+    # the failed inserts were rolled back and the session is usable
+    assert claim_slot(other, other_counsellor.id, start) is not None and _scheduled() == 2
+
+
+# Negative test case: the booking route refuses off-grid and past times without booking anything
+def test_booking_claim_rejects_bad_times(client_as):
+    student, _, counsellor, _ = _people()
+    client = client_as(student)
+    start = _next_slot()
+    for bad in (start + timedelta(minutes=30), start - timedelta(days=14), 'not a time'):
+        response = client.post('/booking/claim', data={'counsellor_id': counsellor.id, 'start': str(bad)})
+        assert response.status_code == 400
+    assert _scheduled() == 0
+
+    response = client.post('/booking/claim', data={'counsellor_id': counsellor.id, 'start': start.isoformat()})
+    assert response.status_code == 302 and _scheduled() == 1
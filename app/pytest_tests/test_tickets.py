@@ -0,0 +1,31 @@
+import sqlalchemy as sa
+from app import db
+from app.models import Admin, Student, Ticket, TicketMessage
+
+
+# Positive test case: asking the chatbot for a human opens a ticket row with its first message
+def test_create_ticket_route_writes_ticket(client_as):
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    db.session.add(student)
+    db.session.commit()
+    client = client_as(student)
+    with client.session_transaction() as session:
+        session['conversation_id'] = 7
+
+    response = client.post('/chatbot/create_ticket')
+    assert response.status_code == 200
+    ticket = db.session.get(Ticket, response.get_json()['ticket_id'])
+    assert ticket.student_id == student.id and ticket.status == 'open'
+    message = db.session.scalars(sa.select(TicketMessage).where(TicketMessage.ticket_id == ticket.id)).one()
+    assert message.sender_id == student.id and '#7' in message.content
+
+
+# Negative test case: only students can open tickets, and a refused request writes nothing
+def test_create_ticket_route_refuses_non_students(client_as):
+    admin = Admin(username='a', email='a@uniss.com', role='Admin')
+    db.session.add(admin)
+    db.session.commit()
+
+    response = client_as(admin).post('/chatbot/create_ticket')
+    assert response.status_code == 403
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(Ticket)) == 0
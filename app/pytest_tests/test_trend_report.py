@@ -2,8 +2,13 @@ import pytest
 from flask.signals import template_rendered
 import flask_login.utils
 from app import app as flask_app
-from app.models import Review
-from app.views import chatbot_queries
+import app.views as views
+from app.models import ReviewStat
+from app.query_sketch import SpaceSaving
+from app.analytics import aggregate_trends
+
+def empty_trends(start, end, bucket):
+    return aggregate_trends(start, end, bucket, [], [], [], [], [], [])
 
 class DummyAdmin:
     is_authenticated = True
@@ -15,28 +20,29 @@ class DummyAdmin:
 def fake_get_user():
     return DummyAdmin()
 
+# Render the report on every request; the version-keyed page cache would need the database
+@pytest.fixture(autouse=True)
+def no_page_cache(monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'TREND_REPORT_CACHE', False)
+
 # Positive test case
 def test_trend_report_view_with_data(monkeypatch):
     with flask_app.app_context():
         monkeypatch.setattr(flask_login.utils, "_get_user", fake_get_user,)
 
-        # Prepare dummy reviews with known stars values (2 and 4)
-        class DummyReviewObj:
-            def __init__(self, stars):
-                self.stars = stars
-        dummy_reviews = [DummyReviewObj(2), DummyReviewObj(4)]
-
-        # Define named function for classmethod
-        def dummy_all_reviews(cls):
-            return dummy_reviews
+        # Prepare a dummy rollup holding two reviews with known stars values (2 and 4)
+        dummy_stats = [ReviewStat(feature='Chatbot', review_count=2, star_sum=6,
+                                  stars_0=0, stars_1=0, stars_2=1, stars_3=0, stars_4=1, stars_5=0)]
 
-        # Monkeypatch Review.query.all() to return dummy reviews
-        QueryStub = type('Q', (), {'all': classmethod(dummy_all_reviews)})
-        monkeypatch.setattr(Review, 'query', QueryStub)
+        # Monkeypatch the rollup read so no database is needed
+        monkeypatch.setattr(views, 'feature_stats', lambda: dummy_stats)
+        monkeypatch.setattr(views, 'compute_trends', empty_trends)
 
-        # Populate chatbot_queries list with sample query strings to simulate recorded chatbot interactions
-        chatbot_queries.clear()
-        chatbot_queries.extend(['x', 'x', 'y'])
+        # Feed sample query strings into a local sketch to simulate recorded chatbot interactions
+        sketch = SpaceSaving(capacity=10)
+        for query in ['x', 'x', 'y']:
+            sketch.add(query)
+        monkeypatch.setattr(views.query_sketch, 'most_common', sketch.most_common)
 
         # Capture the template context passed to the trend_report.html template
         recorded = []
@@ -59,6 +65,7 @@ def test_trend_report_view_with_data(monkeypatch):
         context = recorded[0]
         assert context['avg_score'] == pytest.approx(3.0)
         assert context['total_ratings'] == 2
+        assert context['feature_stats'][0].histogram == [0, 0, 1, 0, 1, 0]
         assert context['common_queries'] == [
             {'text': 'x', 'count': 2},
             {'text': 'y', 'count': 1}
@@ -70,15 +77,12 @@ def test_trend_report_view_without_data(monkeypatch):
     monkeypatch.setattr(flask_login.utils, "_get_user", fake_get_user, )
 
     with flask_app.app_context():
-        # Define named function for no reviews
-        def no_reviews(cls):
-            return []
-        # Monkeypatch no reviews
-        QueryStub = type('Q', (), {'all': classmethod(no_reviews)})
-        monkeypatch.setattr(Review, 'query', QueryStub)
+        # Monkeypatch an empty rollup (no reviews)
+        monkeypatch.setattr(views, 'feature_stats', lambda: [])
+        monkeypatch.setattr(views, 'compute_trends', empty_trends)
 
-        # Clear the chatbot_queries list to simulate zero recorded interactions
-        chatbot_queries.clear()
+        # An empty sketch simulates zero recorded interactions
+        monkeypatch.setattr(views.query_sketch, 'most_common', SpaceSaving(capacity=10).most_common)
 
         # Capture template context
         recorded = []
@@ -101,4 +105,8 @@ def test_trend_report_view_without_data(monkeypatch):
         context = recorded[0]
         assert context['avg_score'] == 0
         assert context['total_ratings'] == 0
-        assert context['common_queries'] == []
\ No newline at end of file
+        assert context['feature_stats'] == []
+        assert context['common_queries'] == []
+        # the activity table defaults to the last 30 days, one row per day
+        assert context['bucket'] == 'day'
+        assert len(context['trends'].starts) == 30
\ No newline at end of file
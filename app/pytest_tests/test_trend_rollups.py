@@ -0,0 +1,49 @@
+from datetime import date
+import sqlalchemy as sa
+from app.models import Review, Student, TrendReviewDay, TrendWatermark
+from app.trend_rollups import MESSAGES, REVIEWS, fold_new_activity, rollup_trends
+
+
+def _writes(db):
+    """ Start recording the INSERT, UPDATE and DELETE statements the engine runs. """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            statements.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', record)
+    return statements, lambda: sa.event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _student(db):
+    student = Student(username='s', email='s@uniss.com', role='Student')
+    db.session.add(student)
+    db.session.commit()
+    return student
+
+
+# Positive test case: new reviews are folded into the rollups in chunks and the watermark moves past them
+def test_fold_new_activity_folds_new_rows(database):
+    student = _student(database)
+    database.session.add_all(Review(user_id=student.id, stars=stars, text='ok') for stars in (3, 4, 5))
+    database.session.commit()
+
+    assert fold_new_activity(chunk_size=2) == {MESSAGES: 0, REVIEWS: 3}
+    assert database.session.get(TrendWatermark, REVIEWS).last_id == 3
+    assert database.session.scalar(sa.select(sa.func.sum(TrendReviewDay.reviews))) == 3
+    assert rollup_trends(date.today(), date.today()) is not None
+
+
+# Negative test case: with nothing new, a fold only reads and never opens a write transaction
+def test_fold_new_activity_without_new_rows_does_not_write(database):
+    student = _student(database)
+    database.session.add(Review(user_id=student.id, stars=4, text='ok'))
+    database.session.commit()
+    fold_new_activity()
+
+    statements, stop = _writes(database)
+    try:
+        assert fold_new_activity() == {MESSAGES: 0, REVIEWS: 0}
+    finally:
+        stop()
+    assert statements == []
@@ -0,0 +1,185 @@
+import atexit
+import heapq
+import re
+import threading
+import time
+from operator import itemgetter
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import app, db
+from app.models import QueryCount
+
+_NON_WORD = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+MAX_QUERY_LENGTH = 256
+
+
+def normalise_query(text):
+    """ Lower-case, drop punctuation and collapse whitespace so trivial variants of a question count together. """
+    text = _NON_WORD.sub(' ', text.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class _Bucket:
+    """ Stream-summary node: the items that currently share one count. """
+    __slots__ = ('count', 'items', 'prev', 'next')
+
+    def __init__(self, count, prev, next):
+        self.count = count
+        self.items = {}  # used as an insertion-ordered set
+        self.prev = prev
+        self.next = next
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary (Metwally et al.) holding at most `capacity` counters.
+    When full, the smallest counter is replaced and the newcomer inherits its count as an error bound,
+    so memory stays fixed however many distinct queries arrive.
+
+    Counters live in the paper's stream-summary: a linked list of buckets in increasing count order,
+    so the smallest counter is always at the head and a unit increment moves an item one bucket along.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self._buckets: dict[str, _Bucket] = {}
+        self._head = None
+
+    def _detach(self, item):
+        """ Take `item` out of its bucket; returns the bucket to search forward from when re-inserting it. """
+        bucket = self._buckets.pop(item)
+        del bucket.items[item]
+        if bucket.items:
+            return bucket
+        if bucket.prev is None:
+            self._head = bucket.next
+        else:
+            bucket.prev.next = bucket.next
+        if bucket.next is not None:
+            bucket.next.prev = bucket.prev
+        return bucket.prev
+
+    def _insert(self, item, count, start):
+        # `start` is a bucket with a smaller count than `count`, or None to search from the head
+        prev = start
+        node = self._head if start is None else start.next
+        while node is not None and node.count < count:
+            prev, node = node, node.next
+        if node is None or node.count != count:
+            node = _Bucket(count, prev, node)
+            if prev is None:
+                self._head = node
+            else:
+                prev.next = node
+            if node.next is not None:
+                node.next.prev = node
+        node.items[item] = None
+        self._buckets[item] = node
+        self.counts[item] = count
+
+    def add(self, item, count=1):
+        if item in self.counts:
+            self._insert(item, self.counts[item] + count, self._detach(item))
+        elif len(self.counts) < self.capacity:
+            self.errors[item] = 0
+            self._insert(item, count, None)
+        else:
+            victim = next(iter(self._head.items))
+            floor = self.counts.pop(victim)
+            del self.errors[victim]
+            self.errors[item] = floor
+            self._insert(item, floor + count, self._detach(victim))
+
+    def most_common(self, k):
+        return heapq.nlargest(k, self.counts.items(), key=itemgetter(1))
+
+    def drain(self):
+        """ Return [(item, count, error), ...] and reset the summary. """
+        items = [(item, count, self.errors[item]) for item, count in self.counts.items()]
+        self.counts.clear()
+        self.errors.clear()
+        self._buckets.clear()
+        self._head = None
+        return items
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class SharedQuerySketch:
+    """
+    Per-process Space-Saving buffer that is periodically merged into the query_counts table.
+    Merging sums counts and then keeps only the top `capacity` rows, so every gunicorn worker
+    reads the same bounded table and most_common(k) is an indexed LIMIT k query.
+    """
+
+    def __init__(self, capacity, flush_seconds, flush_size):
+        self.capacity = capacity
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self._pending = SpaceSaving(capacity)
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, text):
+        query = normalise_query(text)[:MAX_QUERY_LENGTH]
+        if not query:
+            return
+        with self._lock:
+            self._pending.add(query)
+            self._pending_total += 1
+            due = (self._pending_total >= self.flush_size
+                   or time.monotonic() - self._last_flush >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            items = self._pending.drain()
+            self._pending_total = 0
+            self._last_flush = time.monotonic()
+        if not items:
+            return
+
+        stmt = sqlite_insert(QueryCount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QueryCount.text],
+            set_={'count': QueryCount.count + stmt.excluded.count,
+                  'error': QueryCount.error + stmt.excluded.error},
+        )
+        top = sa.select(QueryCount.text).order_by(QueryCount.count.desc()).limit(self.capacity)
+        with db.engine.begin() as conn:
+            conn.execute(stmt, [{'text': q, 'count': c, 'error': e} for q, c, e in items])
+            conn.execute(sa.delete(QueryCount).where(QueryCount.text.not_in(top)))
+
+    def most_common(self, k):
+        """
+        Top-k (query, count) pairs across all workers, including this process's unflushed queries.
+        Read-only: the pending counts are merged in memory and reach the table on record()'s schedule.
+        """
+        with self._lock:
+            pending = dict(self._pending.counts)
+        top = sa.select(QueryCount.text).order_by(QueryCount.count.desc()).limit(k)
+        q = sa.select(QueryCount.text, QueryCount.count).where(
+            sa.or_(QueryCount.text.in_(top), QueryCount.text.in_(list(pending))))
+        counts = dict(db.session.execute(q).all())
+        for text, count in pending.items():
+            counts[text] = counts.get(text, 0) + count
+        return heapq.nlargest(k, counts.items(), key=itemgetter(1))
+
+
+query_sketch = SharedQuerySketch(
+    capacity=app.config['QUERY_SKETCH_CAPACITY'],
+    flush_seconds=app.config['QUERY_SKETCH_FLUSH_SECONDS'],
+    flush_size=app.config['QUERY_SKETCH_FLUSH_SIZE'],
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    with app.app_context():
+        query_sketch.flush()
@@ -0,0 +1,116 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+from app import app, db
+from app.background import run_in_background
+from app.data_version import data_version
+from app.entities import Report, TrendAnalyser
+from app.models import ReportJob, Student
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    """ Per-process ProcessPoolExecutor, created on first use (and again after a fork). """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # spawn rather than fork: the web worker is multi-threaded and holds open database connections
+            _executor = ProcessPoolExecutor(max_workers=app.config['REPORT_WORKERS'],
+                                            mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _dispatch(job_id):
+    if app.config['REPORT_WORKERS']:
+        _pool().submit(render_report_job, job_id).add_done_callback(_log_failure)
+    else:
+        run_in_background(render_report_job, job_id)
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        app.logger.error('Report worker crashed: %r', future.exception())
+
+
+def _abandoned(job):
+    # a job left queued or running by a process that has since died is retried after the timeout
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=app.config['REPORT_JOB_TIMEOUT'])
+    return job.status in ('queued', 'running') and job.updated_at < cutoff
+
+
+def request_report(student):
+    """
+    Return the ReportJob for the student's report for today. Identical requests share one job and new
+    jobs are rendered off the request path.
+
+    The key is the student and the day rather than the trends data version, which every chat message
+    moves: a finished report is reused for the rest of the day, so it may leave out activity written
+    after it was rendered.
+    """
+    version = data_version()
+    key = f'{student.id}:{date.today().isoformat()}'
+    created = db.session.execute(
+        insert(ReportJob).values(key=key, student_id=student.id, data_version=version, status='queued')
+        .on_conflict_do_nothing(index_elements=['key'])).rowcount
+    db.session.commit()
+    job = db.session.scalar(sa.select(ReportJob).where(ReportJob.key == key))
+    retry = job.status == 'failed' or _abandoned(job) or (job.status == 'done' and not os.path.exists(job.path))
+    if retry:
+        job.status, job.error = 'queued', None
+        db.session.commit()
+    if created or retry:
+        _dispatch(job.id)
+    return job
+
+
+def render_report_job(job_id):
+    """ Runs in a report worker: claim the job, render the report to disk and record the outcome. """
+    with app.app_context():
+        claimed = db.session.execute(sa.update(ReportJob).where(ReportJob.id == job_id,
+                                                                ReportJob.status == 'queued')
+                                     .values(status='running')).rowcount
+        db.session.commit()
+        if not claimed:
+            return  # another worker got there first
+        job = db.session.get(ReportJob, job_id)
+        try:
+            student = db.session.get(Student, job.student_id)
+            analyser = TrendAnalyser()
+            analyser.track_trends()
+            os.makedirs(app.config['REPORT_DIR'], exist_ok=True)
+            path = os.path.join(app.config['REPORT_DIR'], f'report_{job.student_id}_{job.id}.pdf')
+            Report.generate(student, analyser.produce_summary(), path=path)
+        except Exception as e:
+            db.session.rollback()
+            job.status, job.error = 'failed', repr(e)
+            db.session.commit()
+            app.logger.exception('Report job %s failed', job_id)
+            return
+        job.status, job.path = 'done', path
+        _remove_older_reports(job)
+        db.session.commit()
+
+
+def _remove_older_reports(job):
+    older = db.session.scalars(sa.select(ReportJob).where(ReportJob.student_id == job.student_id,
+                                                          ReportJob.id != job.id,
+                                                          ReportJob.status.in_(('done', 'failed')))).all()
+    for old in older:
+        if old.path and os.path.exists(old.path):
+            os.remove(old.path)
+        db.session.delete(old)
+
+
+@atexit.register
+def _shutdown_pool():
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=False, cancel_futures=True)
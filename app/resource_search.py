@@ -0,0 +1,88 @@
+import re
+from datetime import datetime
+from typing import NamedTuple, Optional
+import sqlalchemy as sa
+from markupsafe import Markup, escape
+from app import app, db
+from app.models import Resource
+
+# External-content FTS5 index over resources(title, description): the text lives only in resources and
+# the triggers keep the index in step with every insert, update and delete, including raw SQL ones.
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS resources_fts USING fts5("
+    "title, description, content='resources', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS resources_fts_insert AFTER INSERT ON resources BEGIN "
+    "INSERT INTO resources_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS resources_fts_delete AFTER DELETE ON resources BEGIN "
+    "INSERT INTO resources_fts(resources_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS resources_fts_update AFTER UPDATE OF title, description ON resources BEGIN "
+    "INSERT INTO resources_fts(resources_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO resources_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+# a title match counts for more than a match in the body
+TITLE_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+# control characters can't occur in submitted text, so they mark snippet highlights until escaping is done
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+
+
+class SearchResult(NamedTuple):
+    id: int
+    title: str
+    snippet: Markup
+    last_updated: Optional[datetime]
+
+
+for _statement in FTS_DDL:
+    sa.event.listen(Resource.__table__, 'after_create', sa.DDL(_statement).execute_if(dialect='sqlite'))
+# the triggers go with the resources table, but the virtual table has to be dropped explicitly
+sa.event.listen(Resource.__table__, 'before_drop',
+                sa.DDL('DROP TABLE IF EXISTS resources_fts').execute_if(dialect='sqlite'))
+
+
+def install_resource_search():
+    """ Add the index and triggers to a database created before them, filling it from existing resources. """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        for statement in FTS_DDL:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql("INSERT INTO resources_fts(resources_fts) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    """ Turn free text into an FTS5 query: every word must match, the last one as a prefix (search-as-you-type). """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(snippet):
+    return Markup(str(escape(snippet)).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+def search_resources(text, page=1, per_page=None):
+    """
+    One page of resources matching text, best match first, each with a highlighted snippet of its
+    description. Returns (results, has_next) with results as SearchResult tuples.
+    """
+    per_page = per_page or app.config['RESOURCE_SEARCH_PER_PAGE']
+    query = fts_query(text)
+    if query is None:
+        return [], False
+    rows = db.session.execute(sa.text(
+        "SELECT r.id, r.title, snippet(resources_fts, 1, :start, :end, '…', 16) AS snippet, r.last_updated "
+        "FROM resources_fts JOIN resources r ON r.id = resources_fts.rowid "
+        "WHERE resources_fts MATCH :query "
+        "ORDER BY bm25(resources_fts, :title_weight, :description_weight) "
+        "LIMIT :limit OFFSET :offset"
+    ).columns(id=sa.Integer, title=sa.String, snippet=sa.Text, last_updated=sa.DateTime(timezone=True)),
+        dict(query=query, start=HIGHLIGHT_START, end=HIGHLIGHT_END, title_weight=TITLE_WEIGHT,
+             description_weight=DESCRIPTION_WEIGHT, limit=per_page + 1, offset=(page - 1) * per_page)).all()
+    results = [SearchResult(row.id, row.title, _highlight(row.snippet), row.last_updated) for row in rows[:per_page]]
+    return results, len(rows) > per_page
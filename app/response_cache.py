@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.query_sketch import normalise_query
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache for chatbot replies keyed by (model, normalised prompt).
+    The in-memory tier is bounded by `maxsize`; if `path` is given, replies are also written to a small
+    SQLite file so they survive restarts and are shared by every worker on the host. Every write to the
+    file drops expired replies and then the oldest beyond `disk_maxsize` (default 10 x `maxsize`).
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, path=None, disk_maxsize=None):
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize or 10 * maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            with self._connect() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS responses ('
+                    'model TEXT NOT NULL, prompt TEXT NOT NULL, reply TEXT NOT NULL, expires_at REAL NOT NULL, '
+                    'PRIMARY KEY (model, prompt))'
+                )
+                # replies share one TTL, so expiry order is also write order: pruning walks this index from the end
+                conn.execute('CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)')
+
+    @contextmanager
+    def _connect(self):
+        # one short-lived connection per call keeps the disk tier safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, model, prompt):
+        key = (model, normalise_query(prompt))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, reply = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return reply
+                del self._entries[key]
+
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT reply, expires_at FROM responses WHERE model = ? AND prompt = ? AND expires_at > ?',
+                    (*key, now),
+                ).fetchone()
+            if row is not None:
+                reply, expires_at = row
+                with self._lock:
+                    self._store(key, expires_at, reply)
+                    self.disk_hits += 1
+                return reply
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, model, prompt, reply):
+        key = (model, normalise_query(prompt))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, expires_at, reply)
+        if self.path:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)', (*key, reply, expires_at))
+                conn.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+                conn.execute('DELETE FROM responses WHERE rowid IN ('
+                             'SELECT rowid FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                             (self.disk_maxsize,))
+
+    def _store(self, key, expires_at, reply):
+        self._entries[key] = (expires_at, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM responses')
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
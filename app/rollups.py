@@ -0,0 +1,57 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import Review, ReviewStat
+
+STAR_VALUES = range(6)
+COUNTER_COLUMNS = ['review_count', 'star_sum'] + [f'stars_{s}' for s in STAR_VALUES]
+
+
+def _feature_key(feature):
+    # Review.feature is nullable but the rollup needs a real primary key
+    return feature or ''
+
+
+def feature_filter(feature):
+    """ WHERE clause for the reviews counted under `feature` in review_stats, where '' also stands for NULL. """
+    if feature == '':
+        return sa.or_(Review.feature == '', Review.feature.is_(None))
+    return Review.feature == feature
+
+
+def apply_review(review, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a single review from the review_stats rollup.
+    Runs in the caller's session, so the rollup commits or rolls back together with the review itself.
+    """
+    values = {'feature': _feature_key(review.feature), 'review_count': sign, 'star_sum': sign * review.stars}
+    for s in STAR_VALUES:
+        values[f'stars_{s}'] = sign if review.stars == s else 0
+
+    stmt = sqlite_insert(ReviewStat).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReviewStat.feature],
+        set_={col: getattr(ReviewStat, col) + stmt.excluded[col] for col in COUNTER_COLUMNS},
+    )
+    db.session.execute(stmt)
+
+
+def rebuild_review_stats():
+    """ Recompute review_stats from scratch with a single INSERT ... SELECT over reviews. """
+    feature = sa.func.coalesce(Review.feature, '')
+    aggregates = sa.select(
+        feature,
+        sa.func.count(Review.id),
+        sa.func.sum(Review.stars),
+        *[sa.func.sum(sa.case((Review.stars == s, 1), else_=0)) for s in STAR_VALUES],
+    ).group_by(feature)
+
+    db.session.execute(sa.delete(ReviewStat))
+    db.session.execute(sa.insert(ReviewStat).from_select(['feature'] + COUNTER_COLUMNS, aggregates))
+    db.session.commit()
+
+
+def feature_stats():
+    """ One row per feature that currently has reviews, so the cost is O(features) not O(reviews). """
+    q = sa.select(ReviewStat).where(ReviewStat.review_count > 0).order_by(ReviewStat.feature)
+    return db.session.scalars(q).all()
@@ -0,0 +1,160 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import NamedTuple
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import app, db
+from app.models import Counsellor, CounsellingSession
+
+# Sessions are booked on a fixed grid: COUNSELLING_SLOT_MINUTES long, weekdays between the COUNSELLING_HOURS.
+# Two sessions on the grid overlap only if they start at the same time, which is what lets the partial unique
+# indexes on CounsellingSession turn a double booking into an IntegrityError.
+
+
+def _slot_length():
+    return timedelta(minutes=app.config['COUNSELLING_SLOT_MINUTES'])
+
+
+def slot_floor(moment):
+    """ Start of the grid slot containing `moment` (grid times outside opening hours included). """
+    opening = app.config['COUNSELLING_HOURS'][0] * 60
+    minutes = (moment.hour * 60 + moment.minute - opening) % app.config['COUNSELLING_SLOT_MINUTES']
+    return moment.replace(second=0, microsecond=0) - timedelta(minutes=minutes)
+
+
+def is_slot(start):
+    opening, closing = app.config['COUNSELLING_HOURS']
+    return (start.weekday() < 5 and slot_floor(start) == start
+            and opening * 60 <= start.hour * 60 + start.minute
+            and start + _slot_length() <= start.replace(hour=0, minute=0) + timedelta(hours=closing))
+
+
+def slot_starts(after, until):
+    """ Grid slots starting at or after `after` and before `until`, in time order. """
+    opening, closing = app.config['COUNSELLING_HOURS']
+    day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < until:
+        if day.weekday() < 5:
+            start = day + timedelta(hours=opening)
+            while start + _slot_length() <= day + timedelta(hours=closing) and start < until:
+                if start >= after:
+                    yield start
+                start += _slot_length()
+        day += timedelta(days=1)
+
+
+class FreeSlot(NamedTuple):
+    start: datetime
+    counsellor_id: int
+    counsellor: str
+
+
+class SlotIndex:
+    """
+    Interval index of the scheduled sessions of a group of counsellors: each booked interval is
+    bucketed under every grid slot it overlaps, so asking who is busy in a slot is one dict lookup
+    however many counsellors or sessions there are.
+    """
+
+    def __init__(self, counsellors, booked):
+        self.names = dict(counsellors)
+        self.busy = defaultdict(set)
+        load = Counter()
+        for counsellor_id, start in booked:
+            first = slot_floor(start)
+            self.busy[first].add(counsellor_id)
+            if first != start:
+                # sessions from before the grid can straddle two slots
+                self.busy[first + _slot_length()].add(counsellor_id)
+            load[counsellor_id] += 1
+        # least-booked first, so suggestions spread sessions across counsellors
+        self.by_load = sorted(self.names, key=lambda c: (load[c], c))
+
+    def free_counsellor(self, start):
+        busy = self.busy.get(start, ())
+        if len(busy) >= len(self.by_load):
+            return None
+        return next(c for c in self.by_load if c not in busy)
+
+
+def _scheduled_between(start, end):
+    return sa.and_(CounsellingSession.status == 'scheduled',
+                   CounsellingSession.date_time > start - _slot_length(),
+                   CounsellingSession.date_time < end)
+
+
+def slot_index(specialisation, start, end):
+    """ Build the SlotIndex of the counsellors with `specialisation` from their sessions between start and end. """
+    counsellors = Counsellor.__table__
+    in_specialisation = sa.select(counsellors.c.id).where(counsellors.c.specialisation == specialisation)
+    names = db.session.execute(sa.select(Counsellor.id, Counsellor.username)
+                               .where(Counsellor.id.in_(in_specialisation))).all()
+    # one range seek per counsellor on the (counsellor_id, date_time) unique index
+    booked = db.session.execute(sa.select(CounsellingSession.counsellor_id, CounsellingSession.date_time)
+                                .where(CounsellingSession.counsellor_id.in_(in_specialisation),
+                                       _scheduled_between(start, end))).all()
+    return SlotIndex(names, booked)
+
+
+def next_free_slots(specialisation, n=None, after=None, student_id=None):
+    """
+    The next `n` (default BOOKING_FREE_SLOTS) grid slots in which some counsellor with `specialisation`
+    is free, each with the least-booked such counsellor. Slots the student is already booked into are
+    skipped, and the search stops BOOKING_HORIZON_DAYS ahead.
+    """
+    n = n or app.config['BOOKING_FREE_SLOTS']
+    after = after or datetime.now()
+    until = after + timedelta(days=app.config['BOOKING_HORIZON_DAYS'])
+    index = slot_index(specialisation, after, until)
+    own = set()
+    if student_id is not None:
+        own = {slot_floor(start) for start in db.session.scalars(
+            sa.select(CounsellingSession.date_time).where(CounsellingSession.student_id == student_id,
+                                                          _scheduled_between(after, until)))}
+    free = []
+    for start in slot_starts(after, until):
+        counsellor_id = None if start in own else index.free_counsellor(start)
+        if counsellor_id is not None:
+            free.append(FreeSlot(start, counsellor_id, index.names[counsellor_id]))
+            if len(free) == n:
+                break
+    return free
+
+
+def claim_slot(student, counsellor_id, start):
+    """
+    Book `start` with the counsellor, or return None if the counsellor or the student is already busy.
+    Concurrent claims of the same slot are settled by the unique indexes: exactly one insert commits.
+    """
+    if not is_slot(start) or start <= datetime.now():
+        raise ValueError(f'{start} is not a bookable slot')
+    # sessions from before the grid don't collide on the unique indexes, so look for overlaps with them first
+    clash = db.session.scalar(sa.select(CounsellingSession.id).where(
+        sa.or_(CounsellingSession.counsellor_id == counsellor_id, CounsellingSession.student_id == student.id),
+        _scheduled_between(start, start + _slot_length())).limit(1))
+    if clash is not None:
+        return None
+    session = CounsellingSession(student_id=student.id, counsellor_id=counsellor_id, date_time=start,
+                                 status='scheduled')
+    db.session.add(session)
+    try:
+        db.session.commit()
+    except sa.exc.IntegrityError:
+        db.session.rollback()
+        return None
+    return session
+
+
+def upcoming_sessions(user, limit=20):
+    """ The user's scheduled sessions from now on, as student or as counsellor. """
+    return db.session.scalars(
+        sa.select(CounsellingSession)
+        .options(so.joinedload(CounsellingSession.student), so.joinedload(CounsellingSession.counsellor))
+        .where(sa.or_(CounsellingSession.student_id == user.id, CounsellingSession.counsellor_id == user.id),
+               CounsellingSession.status == 'scheduled', CounsellingSession.date_time >= datetime.now())
+        .order_by(CounsellingSession.date_time).limit(limit)).all()
+
+
+def specialisations():
+    return db.session.scalars(sa.select(Counsellor.__table__.c.specialisation).distinct()
+                              .order_by(Counsellor.__table__.c.specialisation)).all()
@@ -1,5 +1,6 @@
 from app.models import db, CounsellingSession, Ticket
-from app.entities import Resource, Report, Ticket
+from app.entities import Resource, Report
+from app.tickets import add_ticket_message
 
 def manage_counselling_session(self, session_id):
     session = db.session.get(CounsellingSession, session_id)
@@ -11,10 +12,9 @@ def manage_counselling_session(self, session_id):
     db.session.commit()
     return True
 
-def respond_to_ticket(self, ticket_id):
+def respond_to_ticket(self, ticket_id, message="Response from counsellor"):
     ticket = db.session.get(Ticket, ticket_id)
     if not ticket:
         return None
-    ticket.messages.append("Response from counsellor")
-    db.session.commit()
-    return ticket
\ No newline at end of file
+    add_ticket_message(ticket, self, message)
+    return ticket
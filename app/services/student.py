@@ -1,13 +1,14 @@
-from app.models import Student, db
-from app.entities import Resource, Report, Ticket, TrendAnalyser
+from app.models import Student, Ticket, Resource, db
+from app.entities import Report, TrendAnalyser
+from app.tickets import add_ticket_message
 from flask import abort
 from datetime import datetime
 
 def request_resource(student, resource_id):
-    # e.g. check enrollment, lookup Resource, create & return it
-    resource = Resource.query.get_or_404(resource_id)
-    if resource.course_id not in student.course_enrollments:
-        abort(403, "Not enrolled in that course.")
+    # resources aren't tied to courses yet, so any student may read any of them
+    resource = db.session.get(Resource, resource_id)
+    if resource is None:
+        abort(404)
     return resource
 
 def view_well_being_progress(student):
@@ -16,8 +17,9 @@ def view_well_being_progress(student):
     trend_summary = analyser.produce_summary()
     return trend_summary
 
-def respond_to_ticket(student, ticket_id):
-    ticket = Ticket.query.get_or_404(ticket_id)
-    ticket.responded_by = student.id
-    db.session.commit()
-    return ticket
\ No newline at end of file
+def respond_to_ticket(student, ticket_id, message):
+    ticket = db.session.get(Ticket, ticket_id)
+    if ticket is None or ticket.student_id != student.id:
+        abort(404)
+    add_ticket_message(ticket, student, message)
+    return ticket
@@ -0,0 +1,14 @@
+import sqlalchemy as sa
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """ Run `PRAGMA name=value` for each entry on every new DBAPI connection the engine opens. """
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @sa.event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
@@ -0,0 +1,57 @@
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import app, db
+from app.models import Ticket, TicketMessage
+
+
+def open_ticket(student, content):
+    """ Open a ticket for the student, with `content` as the first message of its thread. """
+    ticket = Ticket(student_id=student.id)
+    db.session.add(ticket)
+    db.session.flush()
+    db.session.add(TicketMessage(ticket_id=ticket.id, sender_id=student.id, content=content))
+    db.session.commit()
+    return ticket
+
+
+def add_ticket_message(ticket, sender, content):
+    """ Append a message to the ticket's thread; one INSERT however long the thread already is. """
+    message = TicketMessage(ticket_id=ticket.id, sender_id=sender.id if sender else None, content=content)
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+
+def ticket_thread(ticket_id, after=None, per_page=None):
+    """ One page of a ticket's messages in order, keyset-paginated on id. Returns (messages, next_after). """
+    per_page = per_page or app.config['TICKET_MESSAGES_PER_PAGE']
+    q = (sa.select(TicketMessage).options(so.joinedload(TicketMessage.sender))
+         .where(TicketMessage.ticket_id == ticket_id).order_by(TicketMessage.id).limit(per_page + 1))
+    if after is not None:
+        q = q.where(TicketMessage.id > after)
+    messages = db.session.scalars(q).all()
+    next_after = messages[per_page - 1].id if len(messages) > per_page else None
+    return messages[:per_page], next_after
+
+
+def student_tickets(student_id):
+    return db.session.scalars(sa.select(Ticket).where(Ticket.student_id == student_id).order_by(Ticket.id.desc())).all()
+
+
+def migrate_ticket_messages():
+    """
+    Move messages from the old tickets.messages JSON column into ticket_messages, then drop the column.
+    Does nothing once the column is gone. Returns the number of messages moved.
+    """
+    columns = {c['name'] for c in sa.inspect(db.engine).get_columns('tickets')}
+    if 'messages' not in columns:
+        return 0
+    TicketMessage.__table__.create(db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        # json_each keeps each list's order in its key, so threads come out in their original order
+        moved = conn.execute(sa.text(
+            'INSERT INTO ticket_messages (ticket_id, sender_id, content, created_at) '
+            'SELECT t.id, NULL, j.value, CURRENT_TIMESTAMP FROM tickets t, json_each(t.messages) j '
+            'ORDER BY t.id, j.key')).rowcount
+        conn.execute(sa.text('ALTER TABLE tickets DROP COLUMN messages'))
+    return moved
@@ -0,0 +1,149 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+from app import app, db
+import numpy as np
+from app.analytics import aggregate_trends, day_number, int_column
+from app.models import Message, Review, TrendDay, TrendReviewDay, TrendUserDay, TrendWatermark
+
+MESSAGES = 'messages'
+REVIEWS = 'reviews'
+
+
+def _day(column):
+    # the same day numbers as app.analytics.DAY_SQL
+    return sa.cast(sa.func.julianday(column) - 2440587.5, sa.Integer)
+
+
+def _add(connection, model, columns, rows):
+    """ INSERT ... SELECT `rows` into a rollup, adding the last column onto any existing row with the same key. """
+    counter = columns[-1]
+    stmt = insert(model).from_select(columns, rows)
+    connection.execute(stmt.on_conflict_do_update(index_elements=columns[:-1],
+                                                  set_={counter: getattr(model, counter) + stmt.excluded[counter]}))
+
+
+def _apply_messages(connection, where, sign):
+    day = _day(Message.created_at)
+    where = sa.and_(where, Message.created_at.is_not(None))
+    _add(connection, TrendDay, ['day', 'messages'],
+         sa.select(day, sign * sa.func.count()).where(where).group_by(day))
+    _add(connection, TrendUserDay, ['day', 'user_id', 'events'],
+         sa.select(day, Message.sender_id, sign * sa.func.count())
+         .where(where, Message.sender_id.is_not(None)).group_by(day, Message.sender_id))
+
+
+def _apply_reviews(connection, where, sign):
+    day = _day(Review.created_at)
+    feature = sa.func.coalesce(Review.feature, '')
+    # reviews from before created_at existed have no day and stay out of the trends, as in app.analytics
+    where = sa.and_(where, Review.created_at.is_not(None))
+    _add(connection, TrendReviewDay, ['day', 'feature', 'stars', 'reviews'],
+         sa.select(day, feature, Review.stars, sign * sa.func.count()).where(where).group_by(day, feature, Review.stars))
+    _add(connection, TrendUserDay, ['day', 'user_id', 'events'],
+         sa.select(day, Review.user_id, sign * sa.func.count())
+         .where(where, Review.user_id.is_not(None)).group_by(day, Review.user_id))
+
+
+# source -> (table, function adding (sign=1) or removing (sign=-1) the rows matching a filter)
+SOURCES = {
+    MESSAGES: (Message, _apply_messages),
+    REVIEWS: (Review, _apply_reviews),
+}
+
+
+def _has_new_rows(connection, source, model):
+    old = connection.scalar(sa.select(TrendWatermark.last_id).where(TrendWatermark.source == source)) or 0
+    return (connection.scalar(sa.select(sa.func.max(model.id))) or 0) > old
+
+
+def _fold_chunk(source, chunk_size):
+    """ Fold up to `chunk_size` ids past the source's watermark in one transaction; returns the ids covered. """
+    model, apply = SOURCES[source]
+    # most calls find nothing new, so check in a read transaction and only take the write lock to fold
+    with db.engine.connect() as connection:
+        if not _has_new_rows(connection, source, model):
+            return 0
+    with db.engine.begin() as connection:
+        # writing first takes SQLite's write lock, so concurrent folds queue up here and never count a row twice
+        connection.execute(insert(TrendWatermark).values(source=source, last_id=0).on_conflict_do_nothing())
+        old = connection.scalar(sa.select(TrendWatermark.last_id).where(TrendWatermark.source == source))
+        top = connection.scalar(sa.select(sa.func.max(model.id))) or 0
+        if top <= old:
+            return 0
+        new = min(top, old + chunk_size)
+        apply(connection, sa.and_(model.id > old, model.id <= new), 1)
+        connection.execute(sa.update(TrendWatermark).where(TrendWatermark.source == source).values(last_id=new))
+        return new - old
+
+
+def fold_new_activity(chunk_size=None):
+    """
+    Add messages and reviews written since the last run to the trend rollups and move the watermarks
+    past them, so each run costs time in proportion to the new rows only. Returns the ids covered per
+    source. Runs in its own transactions of TREND_ROLLUP_CHUNK ids each.
+    """
+    chunk_size = chunk_size or app.config['TREND_ROLLUP_CHUNK']
+    folded = {}
+    for source in SOURCES:
+        folded[source] = 0
+        while covered := _fold_chunk(source, chunk_size):
+            folded[source] += covered
+    return folded
+
+
+def retract(connection, source, where):
+    """
+    Take rows that are about to be deleted out of the rollups. Must run before the delete, in the same
+    transaction. ORM deletes of Message and Review do this through the events below; Core bulk deletes
+    must call it themselves.
+    """
+    model, apply = SOURCES[source]
+    watermark = sa.select(TrendWatermark.last_id).where(TrendWatermark.source == source).scalar_subquery()
+    apply(connection, sa.and_(where, model.id <= watermark), -1)
+    # SQLite gives the ids of deleted rows at the top of a table out again, so keep the watermark below them;
+    # everything between the two is being deleted and has just been retracted
+    kept = sa.select(model.id).where(sa.not_(where)).order_by(model.id.desc()).limit(1).scalar_subquery()
+    connection.execute(sa.update(TrendWatermark).where(TrendWatermark.source == source)
+                       .values(last_id=sa.func.min(TrendWatermark.last_id, sa.func.coalesce(kept, 0))))
+
+
+def rebuild_trend_rollups():
+    """ Empty the rollups and fold the whole history again. """
+    with db.engine.begin() as connection:
+        for model in (TrendDay, TrendReviewDay, TrendUserDay, TrendWatermark):
+            connection.execute(sa.delete(model))
+    return fold_new_activity()
+
+
+def rollup_trends(start, end, bucket='day'):
+    """ Same result as app.analytics.compute_trends, read from the rollups in time proportional to the days covered. """
+    first, last = day_number(start), day_number(end)
+    connection = db.session.connection()
+    # rows that retractions brought down to zero are left in place and skipped here
+    reviews = connection.execute(
+        sa.select(TrendReviewDay.day, TrendReviewDay.feature, TrendReviewDay.stars, TrendReviewDay.reviews)
+        .where(TrendReviewDay.day.between(first, last), TrendReviewDay.reviews > 0)).all()
+    days = connection.execute(sa.select(TrendDay.day, TrendDay.messages)
+                              .where(TrendDay.day.between(first, last), TrendDay.messages > 0)).all()
+    # there is a user-day row per active user per day, so like messages in compute_trends they come back
+    # packed into one integer each, read off the primary key index
+    users = int_column("SELECT (day << 32) + user_id FROM trend_user_days WHERE day BETWEEN ? AND ? AND events > 0",
+                       (first, last))
+    review_days, features, stars, review_counts = zip(*reviews) if reviews else ((), (), (), ())
+    day_numbers, message_counts = zip(*days) if days else ((), ())
+    # message counts carry no user, and user-day rows carry no messages (weight 0): they only mark active users
+    message_days = np.concatenate([np.asarray(day_numbers, dtype=np.int64), users >> 32])
+    message_users = np.concatenate([np.full(len(days), -1), users & 0xFFFFFFFF])
+    weights = np.concatenate([np.asarray(message_counts, dtype=np.int64), np.zeros(len(users), dtype=np.int64)])
+    return aggregate_trends(start, end, bucket, review_days, features, stars, [-1] * len(reviews),
+                            message_days, message_users, review_weights=review_counts, message_weights=weights)
+
+
+@sa.event.listens_for(Message, 'before_delete')
+def _retract_message(mapper, connection, target):
+    retract(connection, MESSAGES, Message.id == target.id)
+
+
+@sa.event.listens_for(Review, 'before_delete')
+def _retract_review(mapper, connection, target):
+    retract(connection, REVIEWS, Review.id == target.id)
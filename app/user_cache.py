@@ -0,0 +1,46 @@
+import copy
+import threading
+import time
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+
+
+class UserCache:
+    """
+    Short-lived per-process cache of authenticated users' column values, keyed by user id.
+    A hit rebuilds the right subclass (Admin/Student/Counsellor) and attaches it to the current
+    session with merge(load=False), so flask-login gets a normal persistent object without any SQL.
+    invalidate() only reaches this process; in other workers an entry lives out its `ttl`.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._entries: dict[int, tuple[float, type, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, cls, attrs = entry
+        if expires_at <= time.monotonic():
+            self.invalidate(user_id)
+            return None
+        user = cls(**copy.deepcopy(attrs))
+        so.make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def put(self, user):
+        attrs = {attr.key: getattr(user, attr.key) for attr in sa.inspect(type(user)).column_attrs}
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, type(user), copy.deepcopy(attrs))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
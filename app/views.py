@@ -1,31 +1,43 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify, session, abort
+from flask import render_template, redirect, url_for, flash, request, jsonify, session, abort, Response, stream_with_context, \
+    make_response, send_file
 from app import app
 from app.forms import ChooseForm, LoginForm, RegisterForm, ReviewForm, ChangeEmailForm, ResetPasswordForm
-from werkzeug.security import generate_password_hash
 import os
 import csv
+import json
 import io
 from uuid import uuid4
 from flask_login import current_user, login_user, logout_user
 from app import db
 import sqlalchemy as sa
-from app.models import User, Review, Conversation, Student, Resource, Ticket
+import sqlalchemy.orm as so
+from app.models import User, Review, Conversation, Student, Counsellor, Resource, Ticket, ReportJob
 from urllib.parse import urlsplit
-from app.chatbot import chat_and_log
-from collections import Counter
-from datetime import datetime
+from app.chatbot import chat_and_log, current_conversation_id
+from datetime import date, datetime, timedelta
 from app.entities import AIChatbot
 from app.services.student import request_resource, view_well_being_progress, respond_to_ticket
 from app.decorators import login_required, admin_required
+from app.rollups import apply_review, feature_stats, feature_filter
+from app.query_sketch import query_sketch
+from app.metrics import render_metrics
+from app.history import count_history, delete_history as delete_user_history, delete_history_chunked, history_cutoff, \
+    schedule_compaction
+from app.background import run_in_background
+from app.resource_search import search_resources
+from app.http_cache import page_etag, not_modified, add_validators
+from app.analytics import BUCKETS, compute_trends
+from app.data_version import TRENDS
+from app.page_cache import page_cache
+from markupsafe import Markup
+from app.tickets import student_tickets as student_tickets_for, ticket_thread
+from app.report_jobs import request_report
+from app.exports import EXPORTS, stream_export
+from app.scheduling import next_free_slots, claim_slot, is_slot, upcoming_sessions, specialisations
 
 
 @app.route("/")
 def home():
-    app.logger.debug("Debug")
-    app.logger.info("Info")
-    app.logger.warning("Warning")
-    app.logger.error("Error")
-    app.logger.critical("Critical")
     return render_template('home.html', title="Home")
 
 
@@ -41,17 +53,55 @@ def review():
         #  = None if feature == '' else feature
         review = Review(user=current_user, stars=int(review_form.stars.data), text=text, feature=feature)
         current_user.reviews.append(review)
+        apply_review(review)
         db.session.commit()
         return render_template('review.html', title="Home", form=review_form)
     return render_template('review.html', title="Home", form=review_form)
 
 
+# ?feature= value selecting reviews stored without a feature; no value (or an empty one) means all features
+UNSPECIFIED_FEATURE = '_unspecified'
+
+
+def feature_arg(value):
+    """ The feature a ?feature= value selects: None for all features, '' for reviews without one. """
+    if not value:
+        return None
+    return '' if value == UNSPECIFIED_FEATURE else value
+
+
+def feature_param(feature):
+    """ Inverse of feature_arg, for building links and forms. """
+    if feature is None:
+        return None
+    return feature or UNSPECIFIED_FEATURE
+
+
 @app.route("/manage_reviews", methods=['GET'])
 @admin_required
 def manage_reviews():
-    reviews = db.session.execute(db.select(Review)).scalars().all()
+    per_page = app.config['REVIEWS_PER_PAGE']
+    after = request.args.get('after', type=int)
+    feature = feature_arg(request.args.get('feature'))
+    stars = request.args.get('stars', type=int)
+
+    # keyset pagination on id: each page costs one bounded query however many reviews exist
+    q = db.select(Review).options(so.joinedload(Review.user)).order_by(Review.id).limit(per_page + 1)
+    if after is not None:
+        q = q.where(Review.id > after)
+    if feature is not None:
+        q = q.where(feature_filter(feature))
+    if stars is not None:
+        q = q.where(Review.stars == stars)
+    reviews = db.session.execute(q).scalars().all()
+    next_after = reviews[per_page - 1].id if len(reviews) > per_page else None
+    reviews = reviews[:per_page]
+
+    features = [stat.feature for stat in feature_stats()]
     choose_form = ChooseForm()
-    return render_template('manage_reviews.html', title="Manage Reviews", reviews=reviews, choose_form=choose_form)
+    return render_template('manage_reviews.html', title="Manage Reviews", reviews=reviews, choose_form=choose_form,
+                           features=features, feature=feature, feature_param=feature_param(feature),
+                           unspecified=UNSPECIFIED_FEATURE, stars=stars, after=after, next_after=next_after)
 
 @app.route("/delete_review", methods=['POST'])
 def delete_review():
@@ -60,9 +110,27 @@ def delete_review():
         review_id = choose_form.choice.data  # Extract ID from form
         review = db.session.get(Review, review_id)
         if review:
+            apply_review(review, sign=-1)
             db.session.delete(review)
             db.session.commit()
-    return redirect(url_for('manage_reviews'))
+    # back to the page the admin was on, with the same filters
+    return redirect(url_for('manage_reviews', feature=request.form.get('feature') or None,
+                            stars=request.form.get('stars', type=int), after=request.form.get('after', type=int)))
+
+
+@app.route("/export/<name>.csv")
+@admin_required
+def export_csv(name):
+    if name not in EXPORTS:
+        abort(404)
+    start = parse_date(request.args.get('start'))
+    end = parse_date(request.args.get('end'))
+    feature = feature_arg(request.args.get('feature'))
+    # the body is generated while it downloads, so the first rows go out before the query has finished
+    filename = '_'.join(filter(None, [name, start and str(start), end and str(end)])) + '.csv'
+    return Response(stream_with_context(stream_export(name, start, end, feature)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
 
 
 def get_greeting_message():
@@ -80,65 +148,114 @@ def get_greeting_message():
 @login_required
 def chatbot():
     initial_greeting = get_greeting_message()
-    conv = Conversation(user_id=current_user.id)
-    db.session.add(conv)
-    db.session.commit()
-    session["conversation_id"] = conv.id
+    # each visit starts a new conversation; the row is only written once the first message is sent
+    session.pop("conversation_id", None)
+    schedule_compaction()
     return render_template('chatbot.html', title="UoB Chatbot", initial_greeting=initial_greeting)
 
 @app.route("/chatbot/create_ticket", methods=['POST'])
 @login_required
 def create_ticket_route():
+    if not isinstance(current_user, Student):
+        abort(403)
     bot = AIChatbot()
-    ticket = bot.create_ticket(current_user)
+    ticket = bot.create_ticket(current_user, session.get("conversation_id"))
     return jsonify({
-        'ticket_id': ticket.ticket_id,
+        'ticket_id': ticket.id,
         'status': ticket.status
     })
 
 
-chatbot_queries = []
-
 @app.route("/trend_report")
 @login_required
 def trend_report():
-    all_reviews = Review.query.all()
+    end = parse_date(request.args.get('end')) or date.today()
+    start = parse_date(request.args.get('start')) or end - timedelta(days=29)
+    bucket = request.args.get('bucket') if request.args.get('bucket') in BUCKETS else 'day'
+    if start > end:
+        start, end = end, start
+
+    render = lambda: render_trend_report(start, end, bucket)
+    if app.config['TREND_REPORT_CACHE']:
+        report = page_cache.get_or_render(f'trend_report:{start}:{end}:{bucket}', render, TRENDS)
+    else:
+        report = render()
+    return render_template('trend_report.html', title="Chatbot Trend Report", report=Markup(report))
+
 
-    if all_reviews:
-        avg_score = sum(review.stars for review in all_reviews) / len(all_reviews)
-        total_ratings = len(all_reviews)
+def render_trend_report(start, end, bucket):
+    stats = feature_stats()
+
+    total_ratings = sum(stat.review_count for stat in stats)
+    if total_ratings:
+        avg_score = sum(stat.star_sum for stat in stats) / total_ratings
     else:
         avg_score = 0
-        total_ratings = 0
-    if chatbot_queries:
-        query_counter = Counter(chatbot_queries)
-        common_queries = [{'text': query, 'count': count}
-                          for query, count in query_counter.most_common(5)]
-    else:
-        common_queries = []
+    common_queries = [{'text': query, 'count': count} for query, count in query_sketch.most_common(5)]
+    trends = compute_trends(start, end, bucket)
 
     return render_template(
-        'trend_report.html',
-        title="Chatbot Trend Report",
+        'trend_report_body.html',
         avg_score=avg_score,
         total_ratings=total_ratings,
-        common_queries=common_queries
+        feature_stats=stats,
+        common_queries=common_queries,
+        trends=trends,
+        start=start,
+        end=end,
+        bucket=bucket
     )
 
 
+def parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 @app.route('/get', methods=['POST'])
 @login_required
 def get_response():
     user_input = request.form['msg']
 
-    global chatbot_queries
-    chatbot_queries.append(user_input)
+    query_sketch.record(user_input)
 
     bot = AIChatbot()
     response = bot.chat(user_input)
     return jsonify({"reply": response})
 
 
+@app.route('/get/stream', methods=['POST'])
+@login_required
+def stream_response():
+    """ Server-Sent Events version of /get: one 'data' event per reply chunk, then a 'done' event. """
+    user_input = request.form['msg']
+    query_sketch.record(user_input)
+    # the session cookie goes out with the headers, before the streamed body runs
+    current_conversation_id()
+
+    def events():
+        bot = AIChatbot()
+        try:
+            for chunk in bot.chat_stream(user_input):
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        except Exception:
+            app.logger.exception("Chatbot stream failed")
+            yield "event: error\ndata: {}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/metrics')
+@admin_required
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -150,6 +267,10 @@ def login():
         if user is None or not user.check_password(form.password.data):
             flash('Invalid username or password', 'danger')
             return redirect(url_for('login'))
+        if user.password_needs_rehash():
+            # transparently move old hashes to the current PASSWORD_HASH_METHOD
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or urlsplit(next_page).netloc != '':
@@ -201,7 +322,7 @@ def change_email():
 def reset_password():
     form = ResetPasswordForm()
     if form.validate_on_submit():
-        current_user.password_hash = generate_password_hash(form.new_password.data)
+        current_user.set_password(form.new_password.data)
         db.session.commit()
         flash("Password changed successfully. Please log in again.", "success")
         return redirect(url_for("logout"))
@@ -211,25 +332,48 @@ def reset_password():
 @app.route("/account/delete_history", methods=["POST"])
 @login_required
 def delete_history():
-    convs = Conversation.query.filter_by(user_id=current_user.id).all()
-    for conv in convs:
-        db.session.delete(conv)
-    db.session.commit()
-
     session.pop("conversation_id", None)
 
-    flash("Your entire chat history has been deleted.", "info")
+    if count_history(current_user.id) > app.config['HISTORY_DELETE_BACKGROUND_THRESHOLD']:
+        run_in_background(delete_history_chunked, current_user.id, history_cutoff(),
+                          app.config['HISTORY_DELETE_CHUNK_SIZE'])
+        flash("Your chat history is being deleted. This may take a few minutes.", "info")
+    else:
+        delete_user_history(current_user.id)
+        flash("Your entire chat history has been deleted.", "info")
     return redirect(url_for("account"))
 
 
 @app.route('/booking')
 @login_required
 def booking():
-    """
-        Implement CounsellingSession() in entities.py
-        If current_user.role == 'Counsellor', include accessing manage_counselling_session() in counsellor.py
-    """
-    return render_template("booking.html", title="Your Counselling Sessions")
+    # students pick from the next free slots of a specialisation; everyone sees their upcoming sessions
+    options = specialisations() if isinstance(current_user, Student) else []
+    specialisation = request.args.get('specialisation')
+    if specialisation not in options:
+        specialisation = options[0] if options else None
+    slots = next_free_slots(specialisation, student_id=current_user.id) if specialisation else []
+    return render_template("booking.html", title="Your Counselling Sessions", sessions=upcoming_sessions(current_user),
+                           specialisations=options, specialisation=specialisation, slots=slots)
+
+
+@app.route('/booking/claim', methods=['POST'])
+@login_required
+def booking_claim():
+    if not isinstance(current_user, Student):
+        abort(403)
+    counsellor = db.session.get(Counsellor, request.form.get('counsellor_id', type=int))
+    try:
+        start = datetime.fromisoformat(request.form.get('start', ''))
+    except ValueError:
+        abort(400)
+    if counsellor is None or not is_slot(start) or start <= datetime.now():
+        abort(400)
+    if claim_slot(current_user, counsellor.id, start) is None:
+        flash("Sorry, that slot has just been taken. Please choose another.", "warning")
+    else:
+        flash(f"Your session with {counsellor.username} is booked for {start:%A %d %B at %H:%M}.", "success")
+    return redirect(url_for('booking', specialisation=counsellor.specialisation))
 
 
 @app.route('/faq')
@@ -242,16 +386,41 @@ def faq():
 def student_resources():
     if not isinstance(current_user, Student):
         abort(403)
-    resources = Resource.query.order_by(Resource.title).all()
-    return render_template("student/resources.html", title="Available Resources", resources=resources)
+    # collection version: the count catches deletions, which don't move the newest last_updated
+    count, newest = db.session.execute(sa.select(sa.func.count(Resource.id), sa.func.max(Resource.last_updated))).one()
+    etag = page_etag('resources', count, newest.timestamp() if newest else 0)
+    response = not_modified(etag, newest)
+    if response is not None:
+        return response
+
+    q = request.args.get('q', '').strip()
+    if q:
+        page = max(request.args.get('page', 1, type=int), 1)
+        results, has_next = search_resources(q, page)
+        html = render_template("student/resources.html", title="Search Resources", q=q, results=results,
+                               page=page, has_next=has_next)
+    else:
+        resources = Resource.query.order_by(Resource.title).all()
+        html = render_template("student/resources.html", title="Available Resources", q=q, resources=resources)
+    return add_validators(make_response(html), etag, newest)
 
 @app.route('/student/resource/<int:resource_id>')
 @login_required
 def student_request_resource(resource_id):
     if not isinstance(current_user, Student):
         abort(403)
+    last_updated = db.session.execute(sa.select(Resource.last_updated).where(Resource.id == resource_id)).first()
+    if last_updated is None:
+        abort(404)
+    last_updated = last_updated[0]
+    etag = page_etag('resource', resource_id, last_updated.timestamp() if last_updated else 0)
+    response = not_modified(etag, last_updated)
+    if response is not None:
+        return response
+
     resource = request_resource(current_user, resource_id)
-    return render_template('student/resource.html', title=f"Resource - {resource.title}", resource=resource)
+    html = render_template('student/resource.html', title=f"Resource - {resource.title}", resource=resource)
+    return add_validators(make_response(html), etag, last_updated)
 
 @app.route('/student/wellbeing')
 @login_required
@@ -261,21 +430,76 @@ def student_wellbeing():
     progress = view_well_being_progress(current_user)
     return render_template('student/wellbeing.html', title="Well‑being Progress", progress=progress)
 
+def report_job_status(job):
+    status = {'job_id': job.id, 'status': job.status,
+              'status_url': url_for('student_report_status', job_id=job.id)}
+    if job.status == 'done':
+        status['download_url'] = url_for('student_report_download', job_id=job.id)
+    elif job.status == 'failed':
+        status['error'] = 'The report could not be generated. Please try again.'
+    return status
+
+def own_report_job(job_id):
+    job = db.session.get(ReportJob, job_id)
+    if job is None or job.student_id != current_user.id:
+        abort(404)
+    return job
+
+@app.route('/student/report', methods=['POST'])
+@login_required
+def student_report():
+    if not isinstance(current_user, Student):
+        abort(403)
+    # rendered by app.report_jobs; the page polls the status URL until the download is ready
+    job = request_report(current_user)
+    return jsonify(report_job_status(job)), 200 if job.status == 'done' else 202
+
+@app.route('/student/report/<int:job_id>')
+@login_required
+def student_report_status(job_id):
+    if not isinstance(current_user, Student):
+        abort(403)
+    return jsonify(report_job_status(own_report_job(job_id)))
+
+@app.route('/student/report/<int:job_id>/download')
+@login_required
+def student_report_download(job_id):
+    if not isinstance(current_user, Student):
+        abort(403)
+    job = own_report_job(job_id)
+    if job.status != 'done' or not os.path.exists(job.path):
+        abort(404)
+    return send_file(job.path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'wellbeing_report_{job.created_at:%Y-%m-%d}.pdf')
+
 @app.route("/student/tickets")
 @login_required
 def student_tickets():
     if not isinstance(current_user, Student):
         abort(403)
-    tickets = Ticket.query.order_by(Ticket.id).all()
+    tickets = student_tickets_for(current_user.id)
     return render_template("student/tickets.html", title="Tickets", tickets=tickets)
 
+@app.route('/student/ticket/<int:ticket_id>')
+@login_required
+def student_ticket(ticket_id):
+    if not isinstance(current_user, Student):
+        abort(403)
+    ticket = db.session.get(Ticket, ticket_id)
+    if ticket is None or ticket.student_id != current_user.id:
+        abort(404)
+    after = request.args.get('after', type=int)
+    messages, next_after = ticket_thread(ticket_id, after=after)
+    return render_template('student/ticket.html', title=f"Ticket #{ticket_id}", ticket=ticket,
+                           messages=messages, after=after, next_after=next_after)
+
 @app.route('/student/ticket/<int:ticket_id>/respond', methods=['POST'])
 @login_required
 def student_respond_ticket(ticket_id):
     if not isinstance(current_user, Student):
         abort(403)
-    ticket = respond_to_ticket(current_user, ticket_id)
-    return render_template('student/ticket.html', title=f"Ticket #{ticket_id}", ticket=ticket)
+    respond_to_ticket(current_user, ticket_id, request.form['message'])
+    return redirect(url_for('student_ticket', ticket_id=ticket_id))
 
 
 # Error handler for 403 Forbidden
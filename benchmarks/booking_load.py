@@ -0,0 +1,126 @@
+"""
+Load test for counselling bookings: free-slot queries and concurrent slot claims.
+
+A scratch database is seeded with seed_large_db, then a child process times next_free_slots for every
+specialisation and fires bookings from many threads at once, all chasing the same earliest slots of one
+specialisation. Afterwards it checks that no counsellor or student ended up with two sessions in a slot.
+Run from the repository root:
+
+    python -m benchmarks.booking_load --users 20000 --sessions 20000 --threads 16 --bookings 25
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.hot_paths import timed
+
+
+def run_load(users, sessions, threads, bookings, iterations):
+    """ Runs inside the child process, whose DATABASE_URL points at a fresh scratch database. """
+    import sqlalchemy as sa
+    from app import app, db
+    from app.debug_utils import seed_large_db
+    from app.models import CounsellingSession, Student
+    from app.scheduling import claim_slot, next_free_slots, specialisations
+
+    with app.app_context():
+        seed_large_db(users=users, conversations=1_000, messages=1_000, reviews=1_000, tickets=100,
+                      sessions=sessions, resources=100)
+        options = specialisations()
+        student_ids = db.session.scalars(sa.select(Student.id)).all()
+        for specialisation in options:
+            yield f'next_free_slots[{specialisation}]', timed(lambda: next_free_slots(specialisation), iterations)
+    target = options[0]
+
+    counts = {'booked': 0, 'conflicts': 0, 'unbooked': 0}
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def booker():
+        booked = conflicts = unbooked = 0
+        samples = []
+        with app.app_context():
+            barrier.wait()
+            for _ in range(bookings):
+                student = db.session.get(Student, random.choice(student_ids))
+                start = time.perf_counter()
+                # take the earliest free slot, falling back down the list when another thread wins it
+                for slot in next_free_slots(target, student_id=student.id):
+                    if claim_slot(student, slot.counsellor_id, slot.start) is not None:
+                        booked += 1
+                        break
+                    conflicts += 1
+                else:
+                    unbooked += 1
+                samples.append((time.perf_counter() - start) * 1000)
+        with lock:
+            counts['booked'] += booked
+            counts['conflicts'] += conflicts
+            counts['unbooked'] += unbooked
+            latencies.extend(samples)
+
+    workers = [threading.Thread(target=booker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        a, b = sa.orm.aliased(CounsellingSession), sa.orm.aliased(CounsellingSession)
+        double_booked = {
+            role: db.session.scalar(sa.select(sa.func.count()).select_from(a).join(b, sa.and_(
+                getattr(a, role) == getattr(b, role), a.id < b.id, a.date_time == b.date_time,
+                a.status == 'scheduled', b.status == 'scheduled')))
+            for role in ('counsellor_id', 'student_id')}
+    latencies.sort()
+    yield 'concurrent_bookings', {
+        'specialisation': target, 'threads': threads, **counts,
+        'bookings_per_sec': round(counts['booked'] / elapsed, 1),
+        'median_ms': round(latencies[len(latencies) // 2], 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        'double_booked_counsellor': double_booked['counsellor_id'],
+        'double_booked_student': double_booked['student_id'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20_000, help='about 1 in 25 users is a counsellor')
+    parser.add_argument('--sessions', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--bookings', type=int, default=25, help='bookings attempted per thread')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        failed = False
+        for name, result in run_load(args.users, args.sessions, args.threads, args.bookings, args.iterations):
+            print(json.dumps({'benchmark': name, **result}), flush=True)
+            failed = failed or bool(result.get('double_booked_counsellor') or result.get('double_booked_student'))
+        sys.exit(1 if failed else 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   DATABASE_URL='sqlite:///' + os.path.join(tmp, 'booking.sqlite'),
+                   APP_PROFILE='production',
+                   PASSWORD_HASH_WORKERS='0')
+        env.setdefault('GOOGLE_API_KEY', 'benchmark')
+        result = subprocess.run([sys.executable, '-m', 'benchmarks.booking_load', '--worker', *sys.argv[1:]],
+                                env=env, stdout=subprocess.PIPE, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith('{'):
+            print(line, flush=True)
+    sys.exit(result.returncode)
+
+
+if __name__ == '__main__':
+    main()
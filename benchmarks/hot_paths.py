@@ -0,0 +1,190 @@
+"""
+Timing benchmarks for the chatbot, review and trend-report hot paths.
+
+For every dataset size a scratch SQLite database is generated with seed_large_db and a child process
+benchmarks it with Gemini stubbed out, so no network calls are made. Results are printed as one JSON
+object per line and can be saved and compared between commits:
+
+    python -m benchmarks.hot_paths --sizes small,medium --output before.json
+    python -m benchmarks.hot_paths --sizes small,medium --compare before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SIZES = {
+    'small': dict(users=1_000, conversations=2_000, messages=20_000, reviews=2_000, tickets=200, sessions=500,
+                  resources=500),
+    'medium': dict(users=10_000, conversations=20_000, messages=200_000, reviews=20_000, tickets=2_000,
+                   sessions=5_000, resources=5_000),
+    'large': dict(users=100_000, conversations=200_000, messages=2_000_000, reviews=100_000, tickets=20_000,
+                  sessions=50_000, resources=20_000),
+}
+ROUTING_MESSAGES = [
+    'How can I clear all conversation history?',   # exact FAQ
+    'can i book an appointment for counseling',    # near-miss FAQ
+    'Where are the resources?',                     # keyword
+    'I feel stressed about exams',                  # LLM (stubbed, then cached)
+]
+
+
+def timed(fn, iterations, warmup=5):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'median_ms': round(samples[len(samples) // 2], 4),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 4),
+    }
+
+
+def run_benchmarks(size, iterations):
+    """ Runs inside the child process, whose DATABASE_URL points at a fresh scratch database. """
+    import flask_login
+    import sqlalchemy as sa
+    from flask import session
+    from app import app, db
+    from app import chatbot
+    from app.debug_utils import seed_large_db
+    from app.models import User, Conversation, load_user, user_cache
+    from app.resource_search import search_resources
+
+    class StubResponse:
+        text = 'Here are some general wellbeing tips.'
+
+    chatbot.client.models.generate_content = lambda model, contents: StubResponse()
+
+    with app.app_context():
+        start = time.perf_counter()
+        seed_large_db(**SIZES[size])
+        yield 'seed_large_db', {'iterations': 1, 'mean_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+        student = db.session.scalar(sa.select(User).where(User.username == 'student1'))
+        conversation = Conversation(user_id=student.id)
+        db.session.add(conversation)
+        db.session.commit()
+        student_id, conversation_id = student.id, conversation.id
+        admin_id = db.session.scalar(sa.select(User.id).where(User.username == 'admin1'))
+
+    with app.test_request_context('/get', method='POST'):
+        flask_login.login_user(db.session.get(User, student_id))
+        chatbot.response_cache.clear()
+        messages = iter(ROUTING_MESSAGES * (iterations + 10))
+        yield 'get_bot_response', timed(lambda: chatbot.get_bot_response(next(messages)), iterations)
+
+        session['conversation_id'] = conversation_id
+        yield 'chat_and_log', timed(lambda: chatbot.chat_and_log('I feel stressed about exams'), iterations)
+
+    with app.app_context():
+        def cold_load():
+            user_cache.clear()
+            load_user(student_id)
+            db.session.remove()
+
+        def warm_load():
+            load_user(student_id)
+            db.session.remove()
+        yield 'load_user_cold', timed(cold_load, iterations)
+        yield 'load_user_warm', timed(warm_load, iterations)
+        yield 'resource_search', timed(lambda: search_resources('exam stress sle'), iterations)
+
+    client = app.test_client()
+    with client.session_transaction() as client_session:
+        # what login_user stores, so each request goes through load_user like a real admin session
+        client_session['_user_id'] = str(admin_id)
+        client_session['_fresh'] = True
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+    # the production profile caches the rendered page per data version, which would time cache hits only
+    app.config['TREND_REPORT_CACHE'] = False
+    yield 'trend_report', timed(lambda: get('/trend_report'), iterations)
+    app.config['TREND_REPORT_CACHE'] = True
+    yield 'trend_report_cached', timed(lambda: get('/trend_report'), iterations)
+    yield 'manage_reviews', timed(lambda: get('/manage_reviews'), iterations)
+    yield 'manage_reviews_filtered', timed(lambda: get('/manage_reviews?feature=Chatbot&stars=5'), iterations)
+
+
+def worker(size, iterations):
+    for name, result in run_benchmarks(size, iterations):
+        print(json.dumps({'benchmark': name, 'size': size, **result}), flush=True)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """ Print each benchmark's median against the baseline; returns True if any regressed beyond tolerance. """
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['size']): r for r in map(json.loads, f) if 'median_ms' in r}
+    regressed = False
+    for r in results:
+        old = baseline.get((r['benchmark'], r['size']))
+        if old is None or 'median_ms' not in r:
+            continue
+        change = (r['median_ms'] - old['median_ms']) / old['median_ms'] if old['median_ms'] else 0.0
+        flag = 'REGRESSION' if change > tolerance else ''
+        regressed = regressed or bool(flag)
+        print(f"{r['benchmark']:<26} {r['size']:<7} {old['median_ms']:>10.3f} -> {r['median_ms']:>10.3f} ms "
+              f"({change:+.1%}) {flag}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small,medium', help=f'comma-separated, from {", ".join(SIZES)}')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='also write the JSON lines to this file')
+    parser.add_argument('--compare', help='JSON lines file from an earlier run to compare medians against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed median slowdown before failing')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.iterations)
+        return
+
+    revision = git_revision()
+    results = []
+    for size in args.sizes.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       DATABASE_URL='sqlite:///' + os.path.join(tmp, f'{size}.sqlite'),
+                       APP_PROFILE='production',
+                       PASSWORD_HASH_WORKERS='0')
+            env.setdefault('GOOGLE_API_KEY', 'benchmark')
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.hot_paths', '--worker', size,
+                                  '--iterations', str(args.iterations)],
+                                 env=env, stdout=subprocess.PIPE, text=True, check=True).stdout
+        for line in out.splitlines():
+            if line.startswith('{'):
+                result = {**json.loads(line), 'revision': revision}
+                results.append(result)
+                print(json.dumps(result), flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.writelines(json.dumps(r) + '\n' for r in results)
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Reader/writer throughput of the default SQLite setup versus ProductionConfig.
+
+Each profile gets a fresh database file seeded with chat messages. Reader threads fetch random
+messages by id while writer threads insert and commit new ones, the same mix /chatbot traffic
+produces. Run from the repository root:
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import sqlalchemy as sa
+from config import Config, ProductionConfig
+from app.storage import apply_sqlite_pragmas
+
+metadata = sa.MetaData()
+messages = sa.Table(
+    'messages', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('conversation_id', sa.Integer, nullable=False),
+    sa.Column('content', sa.Text, nullable=False),
+)
+
+
+def make_engine(path, profile):
+    options = dict(getattr(profile, 'SQLALCHEMY_ENGINE_OPTIONS', {}))
+    engine = sa.create_engine(f'sqlite:///{path}', **options)
+    apply_sqlite_pragmas(engine, profile.SQLITE_PRAGMAS)
+    return engine
+
+
+def seed(engine, rows):
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(messages.insert(), [{'conversation_id': i % 100, 'content': f'message {i}'} for i in range(rows)])
+
+
+def run(profile, readers, writers, seconds, rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, 'bench.sqlite'), profile)
+        seed(engine, rows)
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def reader():
+            done = errors = 0
+            while time.monotonic() < deadline:
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(sa.select(messages).where(messages.c.id == random.randint(1, rows))).first()
+                    done += 1
+                except sa.exc.OperationalError:
+                    errors += 1
+            with lock:
+                counts['reads'] += done
+                counts['errors'] += errors
+
+        def writer():
+            done = errors = 0
+            while time.monotonic() < deadline:
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(messages.insert(), {'conversation_id': 0, 'content': 'benchmark'})
+                    done += 1
+                except sa.exc.OperationalError:
+                    errors += 1
+            with lock:
+                counts['writes'] += done
+                counts['errors'] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return {
+        'profile': profile.__name__,
+        'readers': readers,
+        'writers': writers,
+        'seconds': seconds,
+        'reads_per_sec': round(counts['reads'] / seconds, 1),
+        'writes_per_sec': round(counts['writes'] / seconds, 1),
+        'errors': counts['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=50_000)
+    args = parser.parse_args()
+
+    for profile in (Config, ProductionConfig):
+        print(json.dumps(run(profile, args.readers, args.writers, args.seconds, args.rows)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 class Config:
@@ -7,6 +8,111 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'data', 'uploads')
     MAX_CONTENT_LENGTH = 1 * 1024 * 1024
 
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app', 'data', 'data.sqlite')
+    REVIEWS_PER_PAGE = 50
+    TICKET_MESSAGES_PER_PAGE = 50
+    RESOURCE_SEARCH_PER_PAGE = 20
+    # resource pages are revalidated with ETag/Last-Modified; a max-age lets browsers skip even that for a while
+    RESOURCE_CACHE_MAX_AGE = 0
+    # histories with more messages than this are deleted in background chunks of HISTORY_DELETE_CHUNK_SIZE conversations
+    HISTORY_DELETE_BACKGROUND_THRESHOLD = 5000
+    HISTORY_DELETE_CHUNK_SIZE = 500
+    # empty conversations older than the grace period are removed in the background, at most once per interval
+    CONVERSATION_COMPACT_INTERVAL = 3600
+    CONVERSATION_COMPACT_GRACE_SECONDS = 3600
+    # seconds an authenticated user's row is reused by load_user before it is re-read. Changes are invalidated
+    # only in the worker that made them: other workers keep the old row, so a password, role or account change
+    # reaches them only when this runs out. Keep it short.
+    USER_CACHE_TTL = 10
+
+    # counselling sessions are booked on a grid of slots, weekdays from opening to closing hour (app.scheduling)
+    COUNSELLING_SLOT_MINUTES = 60
+    COUNSELLING_HOURS = (9, 17)
+    BOOKING_HORIZON_DAYS = 28
+    BOOKING_FREE_SLOTS = 10
+
+    # werkzeug hash method and cost, e.g. 'scrypt' or 'pbkdf2:sha256:600000'; older hashes are upgraded at login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    # processes that hash/verify passwords off the request thread; 0 hashes inline
+    PASSWORD_HASH_WORKERS = 0
+    # report rendering (app.report_jobs): 0 renders on a background thread, otherwise in a process pool
+    REPORT_WORKERS = 0
+    REPORT_DIR = os.environ.get('REPORT_DIR') or os.path.join(tempfile.gettempdir(), 'uniss_reports')
+    REPORT_JOB_TIMEOUT = 300
+
+    # DATABASE_URL points the app at another database, e.g. a large synthetic one built with `flask seed-large`
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app', 'data', 'data.sqlite')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = True
+    # PRAGMA name -> value, applied to every new SQLite connection by app.storage
+    SQLITE_PRAGMAS = {}
+
+    # chatbot query heavy-hitters (app.query_sketch)
+    QUERY_SKETCH_CAPACITY = 200
+    QUERY_SKETCH_FLUSH_SECONDS = 30
+    QUERY_SKETCH_FLUSH_SIZE = 50
+
+    # Gemini reply cache (app.response_cache); set RESPONSE_CACHE_PATH to keep up to RESPONSE_CACHE_DISK_SIZE
+    # replies across restarts
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 24 * 60 * 60
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH')
+    RESPONSE_CACHE_DISK_SIZE = 10_000
+
+    # minimum TF-IDF similarity for a near-miss phrasing to be answered from FAQ_RESPONSES; negated or
+    # extended questions go to the LLM whatever their score (app.intent_router.covers)
+    CHATBOT_FAQ_THRESHOLD = 0.7
+
+    # conversation context sent to Gemini: recent turns within the token budget, older ones as a rolling summary
+    CHAT_CONTEXT_TOKEN_BUDGET = 1500
+    CHAT_CONTEXT_SCAN_LIMIT = 200
+    CHAT_SUMMARY_MAX_WORDS = 150
+
+    # the trend report is cached per data version (app.page_cache), up to PAGE_CACHE_MAX_ENTRIES pages; after a
+    # change it may lag this many seconds
+    TREND_REPORT_CACHE = True
+    PAGE_CACHE_STALE_SECONDS = 30
+    PAGE_CACHE_MAX_ENTRIES = 1000
+    # TrendAnalyser folds new messages and reviews into daily rollups (app.trend_rollups), this many ids per transaction
+    TREND_ROLLUP_CHUNK = 100_000
+
+    # write-behind chat logging (app.message_log); off by default so messages are committed per request
+    CHAT_LOG_WRITE_BEHIND = False
+    CHAT_LOG_QUEUE_SIZE = 1000
+    CHAT_LOG_BATCH_SIZE = 200
+    CHAT_LOG_FLUSH_SECONDS = 1.0
+    CHAT_LOG_ENQUEUE_TIMEOUT = 0.05
+    # a failed batch is retried this many times, backing off from CHAT_LOG_RETRY_BACKOFF seconds
+    CHAT_LOG_RETRIES = 3
+    CHAT_LOG_RETRY_BACKOFF = 0.2
+
+    # fraction of requests whose latency and SQL usage are recorded for /metrics
+    METRICS_SAMPLE_RATE = 0.1
+
+
+
+class ProductionConfig(Config):
+    """ Storage profile for multi-threaded/multi-process serving: WAL journal, tuned pragmas, pooled connections. """
+    SQLALCHEMY_ECHO = False
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',          # readers no longer block on the writer
+        'synchronous': 'NORMAL',        # fsync at checkpoints instead of every commit; safe with WAL
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,       # negative = KiB, i.e. a 64 MiB page cache per connection
+        'busy_timeout': 5000,           # wait up to 5s for the write lock instead of failing immediately
+    }
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'pool_recycle': 3600,
+        'connect_args': {'check_same_thread': False},
+    }
+
+
+# selected with the APP_PROFILE environment variable
+config_profiles = {
+    'development': Config,
+    'production': ProductionConfig,
+}